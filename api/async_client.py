@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+import aiohttp
+
+binance_url = 'https://api.binance.com'
+coinmarketcap_url = 'https://pro-api.coinmarketcap.com'
+cache_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+
+interval_ms = {'1m': 60000, '5m': 300000, '15m': 900000, '1h': 3600000, '4h': 14400000, '1d': 86400000}
+
+
+def kline_weight(limit):
+    if limit <= 100:
+        return 1
+    if limit <= 500:
+        return 2
+    return 5
+
+
+class ResponseCache:
+    """JSON responses on disk keyed by URL and params, valid for ``ttl`` seconds"""
+
+    def __init__(self, directory=cache_directory, ttl=3600):
+        self.directory = directory
+        self.ttl = ttl
+
+    def path(self, url, params):
+        key = hashlib.sha1((url + json.dumps(params, sort_keys=True)).encode()).hexdigest()
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, url, params, ttl=None):
+        fname = self.path(url, params)
+        if not os.path.isfile(fname) or time.time() - os.path.getmtime(fname) > (ttl or self.ttl):
+            return None
+        with open(fname, 'r') as infile:
+            return json.load(infile)
+
+    def put(self, url, params, data):
+        os.makedirs(self.directory, exist_ok=True)
+        fname = self.path(url, params)
+        with open(fname + '.tmp', 'w') as outfile:
+            json.dump(data, outfile)
+        os.replace(fname + '.tmp', fname)
+
+
+class RateLimiter:
+    """Token bucket of request weight per minute, the way Binance limits its API"""
+
+    def __init__(self, weight_per_minute=1200):
+        self.capacity = weight_per_minute
+        self.tokens = weight_per_minute
+        self.rate = weight_per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, weight=1):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                await asyncio.sleep((weight - self.tokens) / self.rate)
+
+
+class AsyncClient:
+    '''
+    Pooled HTTP session shared by every request of a client, with a weight
+    rate limiter and an optional on-disk response cache. ``base_url`` can
+    point to a local mock server.
+
+    Connection errors, timeouts, rate limits (418, 429) and server errors
+    (5xx) are retried with exponential backoff, or after the Retry-After the
+    server sends. Other error statuses are raised at once.
+    '''
+
+    def __init__(self, base_url, headers=None, limiter=None, cache=None, connections=20, retries=5, backoff=1.0):
+        self.base_url = base_url
+        self.headers = headers or {}
+        self.limiter = limiter or RateLimiter()
+        self.cache = cache
+        self.connections = connections
+        self.retries = retries
+        self.backoff = backoff
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.connections)
+        self.session = aiohttp.ClientSession(connector=connector, headers=self.headers)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def get(self, path, params=None, weight=1, ttl=None):
+        url = self.base_url + path
+        params = params or {}
+        if self.cache is not None and ttl is not None:
+            data = self.cache.get(url, params, ttl)
+            if data is not None:
+                return data
+
+        for attempt in range(self.retries):
+            await self.limiter.acquire(weight)
+            delay = self.backoff * 2 ** attempt
+            try:
+                async with self.session.get(url, params=params) as response:
+                    retry = response.status in (418, 429) or response.status >= 500
+                    if not retry or attempt == self.retries - 1:
+                        response.raise_for_status()
+                        data = await response.json()
+                        break
+                    # rate limited or failing, wait as long as the server asks to
+                    delay = float(response.headers.get('Retry-After', delay))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.retries - 1:
+                    raise
+            await asyncio.sleep(delay)
+
+        if self.cache is not None and ttl is not None:
+            self.cache.put(url, params, data)
+        return data
+
+
+class AsyncBinanceClient(AsyncClient):
+    def __init__(self, base_url=binance_url, **kwargs):
+        super().__init__(base_url, **kwargs)
+
+    async def exchange_info(self, ttl=86400):
+        return await self.get('/api/v3/exchangeInfo', weight=10, ttl=ttl)
+
+    async def usdt_symbols(self):
+        info = await self.exchange_info()
+        return [symbol['symbol'] for symbol in info['symbols'] if symbol['quoteAsset'] == 'USDT']
+
+    async def latest_kline(self, symbol, interval):
+        klines = await self.get('/api/v3/klines', dict(symbol=symbol, interval=interval, limit=1))
+        return klines[-1]
+
+    async def klines(self, symbol, interval, start_ms, end_ms=None, limit=1000):
+        # page boundaries follow from the interval, so every page is requested at once
+        end_ms = end_ms or int(time.time() * 1000)
+        step = interval_ms[interval] * limit
+        pages = await asyncio.gather(*[
+            self.get('/api/v3/klines', dict(symbol=symbol, interval=interval, startTime=start,
+                                            endTime=min(start + step, end_ms) - 1, limit=limit),
+                     weight=kline_weight(limit))
+            for start in range(start_ms, end_ms, step)])
+        return [kline for page in pages for kline in page]
+
+    async def universe_klines(self, symbols, interval, start_ms, end_ms=None):
+        results = await asyncio.gather(*[self.klines(symbol, interval, start_ms, end_ms) for symbol in symbols])
+        return dict(zip(symbols, results))
+
+
+class AsyncCoinMarketCapClient(AsyncClient):
+    def __init__(self, api_key='', base_url=coinmarketcap_url, **kwargs):
+        headers = {'Accepts': 'application/json', 'X-CMC_PRO_API_KEY': api_key}
+        kwargs.setdefault('limiter', RateLimiter(30))
+        kwargs.setdefault('cache', ResponseCache())
+        super().__init__(base_url, headers=headers, **kwargs)
+
+    async def listings(self, ttl=86400):
+        return await self.get('/v1/cryptocurrency/listings/latest', dict(start='1', convert='USD'), ttl=ttl)
@@ -12,17 +12,25 @@ from api import coinmarketcap
 
 binsizes = {"1m": 1, "5m": 5, "1h": 60, "1d": 1440}
 batch_size = 1000
-binance_client = Client(api_key='', api_secret='')
+binance_client = None
 
 start = '1 Sep 2017'
 
 
+def get_client():
+    # created on first use, importing this module does not touch the network
+    global binance_client
+    if binance_client is None:
+        binance_client = Client(api_key='', api_secret='')
+    return binance_client
+
+
 def minutes_of_new_data(symbol, kline_size, data, source):
     if len(data) > 0:
         old = parser.parse(data["timestamp"].iloc[-1])
     else:
         old = datetime.strptime(start, '%d %b %Y')
-    new = pd.to_datetime(binance_client.get_klines(symbol=symbol, interval=kline_size)[-1][0], unit='ms')
+    new = pd.to_datetime(get_client().get_klines(symbol=symbol, interval=kline_size, limit=1)[-1][0], unit='ms')
     return old, new
 
 
@@ -40,8 +48,8 @@ def get_all_binance(symbol, kline_size, save=False):
     else:
         print('Downloading %d minutes of new data available for %s, i.e. %d instances of %s data.' % (
             delta_min, symbol, available_data, kline_size))
-    klines = binance_client.get_historical_klines(symbol, kline_size, oldest_point.strftime("%d %b %Y %H:%M:%S"),
-                                                  newest_point.strftime("%d %b %Y %H:%M:%S"))
+    klines = get_client().get_historical_klines(symbol, kline_size, oldest_point.strftime("%d %b %Y %H:%M:%S"),
+                                                newest_point.strftime("%d %b %Y %H:%M:%S"))
     data = pd.DataFrame(klines,
                         columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_av',
                                  'trades', 'tb_base_av', 'tb_quote_av', 'ignore'])
@@ -68,7 +76,7 @@ def get_top(number):
 
 
 def get_symbols():
-    info = binance_client.get_exchange_info()
+    info = get_client().get_exchange_info()
     # top = get_top(20)
 
     filtered_symbols = []
@@ -78,5 +86,6 @@ def get_symbols():
     return filtered_symbols
 
 
-for symbol in get_symbols():
-    get_all_binance(symbol, '1h', save=True)
+if __name__ == '__main__':
+    for symbol in get_symbols():
+        get_all_binance(symbol, '1h', save=True)
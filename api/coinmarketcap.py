@@ -8,31 +8,38 @@ from datetime import datetime
 
 filename = 'market_cap.json'
 
+session = None
+
+
+def get_session():
+    global session
+    if session is None:
+        session = Session()
+        session.headers.update({
+            'Accepts': 'application/json',
+            'X-CMC_PRO_API_KEY': '',
+        })
+    return session
+
 
 def get_top_cryptos_by_market_volume(number):
-    if redownload():
+    data = get_data_from_file() if os.path.isfile(filename) else None
+    if redownload(data):
         url = 'https://pro-api.coinmarketcap.com/v1/cryptocurrency/listings/latest'
         parameters = {
             'start': '1',
             'convert': 'USD'
         }
-        headers = {
-            'Accepts': 'application/json',
-            'X-CMC_PRO_API_KEY': '',
-        }
-
-        session = Session()
-        session.headers.update(headers)
 
         try:
-            response = session.get(url, params=parameters)
+            response = get_session().get(url, params=parameters)
             data = json.loads(response.text)
             save_json_to_file(data)
 
         except (ConnectionError, Timeout, TooManyRedirects) as e:
             print(e)
 
-    return ["{}{}".format(coin['symbol'], 'USDT') for coin in get_data_from_file()['data']
+    return ["{}{}".format(coin['symbol'], 'USDT') for coin in data['data']
             if not coin['symbol'].startswith('USD') and has_enough_data(coin)][:number]
 
 
@@ -50,8 +57,9 @@ def get_data_from_file():
         return json.load(json_data)
 
 
-def redownload():
-    if not os.path.isfile(filename):
-        return True
-    data = get_data_from_file()
+def redownload(data=None):
+    if data is None:
+        if not os.path.isfile(filename):
+            return True
+        data = get_data_from_file()
     return (datetime.now() - pd.to_datetime(data['status']['timestamp']).to_pydatetime().replace(tzinfo=None)).days > 1
@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from domain.data import sync_directory
+
+kline_columns = ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_av',
+                 'trades', 'tb_base_av', 'tb_quote_av', 'ignore']
+float_columns = ['open', 'high', 'low', 'close', 'volume', 'quote_av', 'tb_base_av', 'tb_quote_av']
+
+manifest_name = 'manifest.json'
+start = '1 Sep 2017'
+
+
+def load_manifest(root):
+    fname = os.path.join(root, manifest_name)
+    if not os.path.isfile(fname):
+        return {}
+    with open(fname, 'r') as infile:
+        return json.load(infile)
+
+
+def save_manifest(root, manifest):
+    fname = os.path.join(root, manifest_name)
+    with open(fname + '.tmp', 'w') as outfile:
+        json.dump(manifest, outfile, indent=1, sort_keys=True)
+    os.replace(fname + '.tmp', fname)
+
+
+def fetch_klines(client, symbol, interval, start_ms, retries=5, backoff=1.0):
+    from binance.exceptions import BinanceAPIException, BinanceRequestException
+
+    for attempt in range(retries):
+        try:
+            return client.get_historical_klines(symbol, interval, start_ms)
+        # network and API errors are worth another attempt, anything else is a bug and raised at once
+        except (OSError, BinanceAPIException, BinanceRequestException) as e:
+            if attempt == retries - 1:
+                raise
+            print('Retrying %s %s after error: %s' % (symbol, interval, e))
+            time.sleep(backoff * 2 ** attempt)
+
+
+def klines_to_frame(klines):
+    df = pd.DataFrame(klines, columns=kline_columns).drop(columns='ignore')
+    df[float_columns] = df[float_columns].astype('float64')
+    df['close_time'] = df['close_time'].astype('int64')
+    df['trades'] = df['trades'].astype('int64')
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df.set_index('timestamp')
+
+
+def partition_path(root, interval, symbol, month):
+    return os.path.join(root, interval, symbol, '%s.parquet' % month)
+
+
+def append_partitions(root, interval, symbol, df):
+    """Writes new rows into one Parquet file per month, only touching the months they fall in"""
+    os.makedirs(os.path.join(root, interval, symbol), exist_ok=True)
+    for month, part in df.groupby(df.index.strftime('%Y-%m')):
+        fname = partition_path(root, interval, symbol, month)
+        if os.path.isfile(fname):
+            part = pd.concat([pd.read_parquet(fname), part])
+            part = part[~part.index.duplicated(keep='last')]
+        part.to_parquet(fname + '.tmp')
+        os.replace(fname + '.tmp', fname)
+
+
+def first_ms(last_ms):
+    return last_ms + 1 if last_ms is not None else pd.Timestamp(start).value // 10 ** 6
+
+
+def sync_symbol(client, root, symbol, interval, last_ms=None):
+    klines = fetch_klines(client, symbol, interval, first_ms(last_ms))
+    return store_klines(root, symbol, interval, klines, last_ms)
+
+
+def store_klines(root, symbol, interval, klines, last_ms=None):
+    """Appends the closed ``klines`` to the partitions, returns the open time of the last one stored"""
+    # the newest kline is still open, keep it for the next sync
+    now_ms = int(time.time() * 1000)
+    klines = [k for k in klines if k[6] < now_ms]
+    if len(klines) == 0:
+        return last_ms
+
+    append_partitions(root, interval, symbol, klines_to_frame(klines))
+    return int(klines[-1][0])
+
+
+def sync(client, symbols, interval='1m', root=sync_directory, workers=8):
+    manifest = load_manifest(root)
+    last = manifest.setdefault(interval, {})
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(sync_symbol, client, root, symbol, interval, last.get(symbol)): symbol
+                   for symbol in symbols}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                last[symbol] = future.result()
+            except Exception as e:
+                print('Failed to sync %s %s: %s' % (symbol, interval, e))
+                continue
+            # persist progress as we go so an interrupted sync resumes where it stopped
+            save_manifest(root, manifest)
+    return manifest
+
+
+async def sync_async(client, symbols, interval='1m', root=sync_directory, end_ms=None):
+    """
+    ``sync`` over an ``AsyncBinanceClient``. Every page of every symbol is
+    requested concurrently on the client's session within its rate limit,
+    each symbol is stored as soon as all of its pages are in.
+    """
+    import aiohttp
+
+    manifest = load_manifest(root)
+    last = manifest.setdefault(interval, {})
+
+    async def fetch(symbol):
+        try:
+            return symbol, await client.klines(symbol, interval, first_ms(last.get(symbol)), end_ms), None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return symbol, None, e
+
+    for task in asyncio.as_completed([fetch(symbol) for symbol in symbols]):
+        symbol, klines, error = await task
+        if error is not None:
+            print('Failed to sync %s %s: %s' % (symbol, interval, error))
+            continue
+        last[symbol] = await asyncio.to_thread(store_klines, root, symbol, interval, klines, last.get(symbol))
+        save_manifest(root, manifest)
+    return manifest
+
+
+def parse_args(pargs=None):
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Incremental sync of Binance klines into monthly Parquet files',
+    )
+
+    parser.add_argument('--interval', default='1m',
+                        help='Kline interval to sync')
+
+    parser.add_argument('--symbols', default='',
+                        help='Comma separated symbols, every USDT pair when empty')
+
+    parser.add_argument('--root', default=sync_directory,
+                        help='Directory holding the partitions and the manifest')
+
+    parser.add_argument('--workers', default=8, type=int,
+                        help='Number of symbols fetched concurrently')
+
+    parser.add_argument('--concurrent', action='store_true', default=False,
+                        help='Fetch every page at once on the pooled async client instead of worker threads')
+
+    parser.add_argument('--base-url', default='',
+                        help='REST endpoint of the async client, a local mock server for tests')
+
+    return parser.parse_args(pargs)
+
+
+async def run_async(args):
+    from api.async_client import AsyncBinanceClient, binance_url
+
+    async with AsyncBinanceClient(args.base_url or binance_url) as client:
+        symbols = args.symbols.split(',') if args.symbols else await client.usdt_symbols()
+        return await sync_async(client, symbols, args.interval, args.root)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.concurrent:
+        asyncio.run(run_async(args))
+    else:
+        from api.binance_feed import get_client, get_symbols
+
+        symbols = args.symbols.split(',') if args.symbols else get_symbols()
+        sync(get_client(), symbols, args.interval, args.root, args.workers)
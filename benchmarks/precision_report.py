@@ -0,0 +1,108 @@
+'''
+Float32 vs float64 and bounded vs full lookback report. Runs as
+``python benchmarks/precision_report.py`` from anywhere, or as
+``python -m benchmarks.precision_report`` from the repository root.
+'''
+import argparse
+import json
+import os
+import resource
+import sys
+
+# run as a script the repository root is not on the path, the benchmarks and domain packages live there
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+import backtrader as bt
+import numpy as np
+
+from benchmarks.strategy_bench import isolated, load_strategy, synthetic_columns
+from domain.commission import CryptoSpotCommissionInfo
+from domain.data import add_columns_to_cerebro, compact_columns, load_columns
+from domain.vectorized import column_matrices, minute_momentum_weights
+
+
+def market_columns(symbols, bars, seed):
+    if symbols.isdigit():
+        return synthetic_columns(int(symbols), bars, seed)
+    return load_columns(period='1m', filter_list=symbols.split(','))
+
+
+def run_case(name, symbols, bars, seed, compact, bounded):
+    columns = market_columns(symbols, bars, seed)
+    if compact:
+        columns = compact_columns(columns)
+
+    cerebro = bt.Cerebro(stdstats=False, exactbars=1 if bounded else False)
+    add_columns_to_cerebro(cerebro, columns)
+    cerebro.addstrategy(load_strategy(name), journal_level='off')
+    cerebro.broker.setcash(1e6)
+    cerebro.broker.addcommissioninfo(CryptoSpotCommissionInfo())
+    strat = cerebro.run()[0]
+
+    return dict(
+        final_value=cerebro.broker.get_value(),
+        orders=len(cerebro.broker.orders),
+        column_mb=sum(column.nbytes for bars in columns.values() for column in bars.values()) / 2 ** 20,
+        # bounded lines keep their values in a deque of Python floats, counted as 8 bytes each
+        line_mb=sum(len(line.array) * 8 for d in strat.datas for line in d.lines) / 2 ** 20,
+        peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    )
+
+
+def signal_drift(columns):
+    """How far the minute momentum target weights move when the closes are float32"""
+    _, (close,) = column_matrices(columns, lines=('close',))
+    full = minute_momentum_weights(close)
+    compact = minute_momentum_weights(close.astype(np.float32).astype(np.float64))
+    flips = np.isnan(full) != np.isnan(compact)
+    both = ~np.isnan(full) & ~np.isnan(compact)
+    return dict(
+        max_price_error=float(np.nanmax(np.abs(close.astype(np.float32) / close - 1.0))),
+        selection_flips=int(flips.sum()),
+        selected_bars=int((~np.isnan(full)).sum()),
+        max_weight_error=float(np.abs(full[both] - compact[both]).max()) if both.any() else 0.0,
+    )
+
+
+def run(args=None):
+    args = parse_args(args)
+
+    report = dict(
+        float64=isolated(run_case, args.strategy, args.symbols, args.bars, args.seed, False, False),
+        float32=isolated(run_case, args.strategy, args.symbols, args.bars, args.seed, True, False),
+        float32_bounded=isolated(run_case, args.strategy, args.symbols, args.bars, args.seed, True, True),
+        signals=signal_drift(market_columns(args.symbols, args.bars, args.seed)),
+    )
+    base = report['float64']['final_value']
+    for case in ('float32', 'float32_bounded'):
+        if 'error' not in report[case]:
+            report[case]['value_error'] = report[case]['final_value'] / base - 1.0
+
+    print(json.dumps(report, indent=1))
+
+
+def parse_args(pargs=None):
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Memory and precision of float32 bars and bounded lookback against float64',
+    )
+
+    parser.add_argument('--strategy', default='MinuteMomentumStrategy',
+                        help='Strategy class name')
+
+    parser.add_argument('--symbols', default='10',
+                        help='Number of synthetic symbols, or comma separated symbols of the 1m data')
+
+    parser.add_argument('--bars', default=50000, type=int,
+                        help='Bars per synthetic symbol')
+
+    parser.add_argument('--seed', default=0, type=int,
+                        help='Seed of the synthetic bars')
+
+    return parser.parse_args(pargs)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# command and startup budget in seconds
+cases = {
+    'strategy_runner --help': ([sys.executable, 'strategy_runner.py', '--help'], 0.3),
+    'sweep_runner --help': ([sys.executable, 'sweep_runner.py', '--help'], 0.3),
+    'import strategy_runner': ([sys.executable, '-c', 'import strategy_runner'], 0.3),
+    'import sweep_runner': ([sys.executable, '-c', 'import sweep_runner'], 0.3),
+    'import domain.data': ([sys.executable, '-c', 'import domain.data'], 1.5),
+}
+
+# modules a plain run must not pull in, they load with the feature that needs them
+optional_modules = ('quantstats', 'pyarrow', 'scipy', 'matplotlib', 'aiohttp')
+# the required dependencies, whatever they load themselves is not counted
+required_modules = 'backtrader, numpy, pandas'
+
+
+def startup_time(command, repeat):
+    """Best wall time of ``repeat`` fresh interpreters, the first run warms the file cache"""
+    times = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=root, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return min(times[1:])
+
+
+def loaded_optional_modules(module):
+    code = 'import sys, %s; print(",".join(m for m in %r if m in sys.modules))' % (module, optional_modules)
+    output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    return [m for m in output.stdout.strip().split(',') if m]
+
+
+def extra_optional_modules(module):
+    required = set(loaded_optional_modules(required_modules))
+    return [m for m in loaded_optional_modules(module) if m not in required]
+
+
+def run(args=None):
+    args = parse_args(args)
+
+    results, failures = {}, []
+    for name, (command, budget) in cases.items():
+        seconds = startup_time(command, args.repeat)
+        results[name] = dict(seconds=round(seconds, 4), budget=budget * args.scale)
+        if seconds > budget * args.scale:
+            failures.append('%s: %.3fs, budget %.3fs' % (name, seconds, budget * args.scale))
+
+    for module in ('strategy_runner', 'sweep_runner', 'domain.data', 'strategy.MinuteMomentumStrategy'):
+        loaded = extra_optional_modules(module)
+        results['import %s' % module] = dict(results.get('import %s' % module, {}), optional=loaded)
+        if loaded:
+            failures.append('%s imports %s' % (module, ', '.join(loaded)))
+
+    print(json.dumps(results, indent=1, sort_keys=True))
+    for failure in failures:
+        print('OVER BUDGET ' + failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+def parse_args(pargs=None):
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Interpreter startup and import time of the command line tools against a budget',
+    )
+
+    parser.add_argument('--repeat', default=5, type=int,
+                        help='Timed runs per command, the best one counts')
+
+    parser.add_argument('--scale', default=1.0, type=float,
+                        help='Multiplier of every budget, for slower machines')
+
+    return parser.parse_args(pargs)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,277 @@
+'''
+Throughput and memory benchmarks of the strategy hot paths. Runs as
+``python benchmarks/strategy_bench.py`` from anywhere, or as
+``python -m benchmarks.strategy_bench`` from the repository root.
+'''
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+# run as a script the repository root is not on the path, the domain and strategy packages live there
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+import backtrader as bt
+import numpy as np
+
+from domain.analysis import AlphalensAnalyzer, QuantStatsAnalyzer
+from domain.commission import CryptoSpotCommissionInfo
+from domain.data import add_columns_to_cerebro
+from domain.indicator import momentum_func, rolling_momentum
+
+strategies = ('MinuteMomentumStrategy', 'MomentumStrategy', 'RebalancingStrategy', 'BinanceStrategy')
+analyzer_hooks = ('_next', '_notify_cashvalue', '_notify_fund', '_notify_order', '_notify_trade')
+
+
+def synthetic_columns(symbols, bars, seed=0):
+    """Geometric random walk OHLCV bars at one minute spacing for ``symbols`` symbols"""
+    rng = np.random.default_rng(seed)
+    dt = np.datetime64('2018-01-01', 'ns').astype(np.int64) + np.arange(bars, dtype=np.int64) * 60 * 10 ** 9
+
+    columns = {}
+    for i in range(symbols):
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0, 0.002, bars)))
+        spread = np.abs(rng.normal(0.0, 0.001, bars)) * close
+        columns['SYM%03dUSDT' % i] = dict(
+            datetime=dt,
+            open=np.r_[close[0], close[:-1]],
+            high=close + spread,
+            low=close - spread,
+            close=close,
+            volume=rng.lognormal(3.0, 1.0, bars),
+        )
+    return columns
+
+
+def load_strategy(name):
+    if name == 'BinanceStrategy':
+        from strategy.lin_regress_momentum import BinanceStrategy
+        return BinanceStrategy
+    module = __import__('strategy.' + name, fromlist=[name])
+    return getattr(module, name)
+
+
+def timed(strategy, phases):
+    """Subclass of ``strategy`` stamping the phases of a run without per-bar overhead"""
+
+    class Timed(strategy):
+        def __init__(self):
+            phases['init'] = time.perf_counter()
+            super(Timed, self).__init__()
+
+        def _start(self):
+            super(Timed, self)._start()
+            phases['analyzers'] = 0.0
+            for analyzer in self.analyzers:
+                for hook in analyzer_hooks:
+                    setattr(analyzer, hook, self._timed_hook(getattr(analyzer, hook)))
+
+        def _timed_hook(self, method):
+            def wrapper(*args, **kwargs):
+                t = time.perf_counter()
+                method(*args, **kwargs)
+                phases['analyzers'] += time.perf_counter() - t
+            return wrapper
+
+        def _once(self):
+            phases['once_start'] = time.perf_counter()
+            super(Timed, self)._once()
+            phases['once_end'] = time.perf_counter()
+
+    Timed.__name__ = strategy.__name__
+    return Timed
+
+
+def run_case(name, symbols, bars, seed=0, runonce=True):
+    columns = synthetic_columns(symbols, bars, seed)
+    phases = {}
+
+    cerebro = bt.Cerebro(stdstats=False, runonce=runonce)
+    add_columns_to_cerebro(cerebro, columns)
+    kwargs = {}
+    if name == 'RebalancingStrategy':
+        # select at least one symbol on small universes
+        kwargs['selcperc'] = max(0.1, 1.0 / symbols)
+    cerebro.addstrategy(timed(load_strategy(name), phases), **kwargs)
+    cerebro.broker.setcash(1e6)
+    cerebro.broker.addcommissioninfo(CryptoSpotCommissionInfo())
+    cerebro.addanalyzer(QuantStatsAnalyzer, _name='quantstats', freq='1D')
+    cerebro.addanalyzer(bt.analyzers.PyFolio, _name='pyfolio')
+    if name == 'RebalancingStrategy':
+        cerebro.addanalyzer(AlphalensAnalyzer, _name='alphalens')
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        t0 = time.perf_counter()
+        strat = cerebro.run()[0]
+        t1 = time.perf_counter()
+
+        from exports import exports
+        with tempfile.TemporaryDirectory() as directory:
+            exports.export_directory = directory
+            returns, positions, transactions, gross_lev = strat.analyzers.pyfolio.get_pf_items()
+            exports.save_artifacts(dict(returns=returns, positions=positions, gross_lev=gross_lev,
+                                        values=strat.analyzers.quantstats.get_analysis()))
+        t2 = time.perf_counter()
+
+    # only the phases the run went through, without runonce the indicators are computed inside the loop
+    recorded = dict(data_load=phases['init'] - t0, analyzers=phases['analyzers'], exports=t2 - t1)
+    loop_start = phases['init']
+    if 'once_end' in phases:
+        recorded['indicators'] = phases['once_end'] - phases['once_start']
+        loop_start = phases['once_end']
+    recorded['next_loop'] = t1 - loop_start - phases['analyzers']
+
+    return dict(
+        strategy=name,
+        symbols=symbols,
+        bars=bars,
+        bars_per_second=bars / (t1 - t0),
+        peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        phases=recorded,
+    )
+
+
+def run_momentum_case(bars, period=20, seed=0):
+    close = synthetic_columns(1, bars, seed)['SYM000USDT']['close']
+
+    t = time.perf_counter()
+    rolling_momentum(close, period)
+    rolling = time.perf_counter() - t
+
+    # the scipy version is timed on a sample of windows, it would take minutes on the full series
+    sample = min(bars - period + 1, 20000)
+    t = time.perf_counter()
+    for i in range(sample):
+        momentum_func(close[i:i + period])
+    linregress = (time.perf_counter() - t) / sample * (bars - period + 1)
+
+    return dict(strategy='Momentum', symbols=1, bars=bars, bars_per_second=bars / rolling,
+                peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+                phases=dict(rolling_momentum=rolling, linregress_estimate=linregress))
+
+
+def run_ranking_case(symbols, window=21, repeat=1000, seed=0):
+    from strategy.lin_regress_momentum import momentum_score, rebalance
+    import pandas as pd
+
+    hist = pd.DataFrame({name: columns['close'] for name, columns in synthetic_columns(symbols, window, seed).items()})
+
+    t = time.perf_counter()
+    for _ in range(repeat):
+        rebalance(None, hist)
+    batched = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for _ in range(repeat):
+        hist.apply(momentum_score)
+    per_symbol = time.perf_counter() - t
+
+    return dict(strategy='momentum_score', symbols=symbols, bars=repeat, bars_per_second=repeat / batched,
+                peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+                phases=dict(rebalance=batched, per_symbol_apply=per_symbol))
+
+
+def isolated(func, *args):
+    # every case runs in a fresh interpreter so peak RSS is its own
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        try:
+            return pool.apply(func, args)
+        except Exception as e:
+            return dict(error='%s: %s' % (type(e).__name__, e))
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None or 'error' in result or 'error' in base:
+            continue
+        if result['bars_per_second'] < base['bars_per_second'] * (1 - tolerance):
+            regressions.append('%s: %.0f bars/s, baseline %.0f' % (key, result['bars_per_second'],
+                                                                   base['bars_per_second']))
+        if result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            regressions.append('%s: %.0f MB peak RSS, baseline %.0f' % (key, result['peak_rss_mb'],
+                                                                        base['peak_rss_mb']))
+    return regressions
+
+
+def run(args=None):
+    args = parse_args(args)
+    symbol_counts = [int(x) for x in args.symbols.split(',')]
+    bar_counts = [int(x) for x in args.bars.split(',')]
+
+    results = {}
+    for bars in bar_counts:
+        results['Momentum/1x%d' % bars] = isolated(run_momentum_case, bars)
+    for symbols in symbol_counts:
+        results['momentum_score/%dx1000' % symbols] = isolated(run_ranking_case, symbols)
+    for name in args.strategies.split(','):
+        for symbols in symbol_counts:
+            for bars in bar_counts:
+                key = '%s/%dx%d%s' % (name, symbols, bars, '' if args.runonce else '/next')
+                result = isolated(run_case, name, symbols, bars, 0, args.runonce)
+                results[key] = result
+                print('%s: %s' % (key, result.get('error') or
+                                        '%.0f bars/s' % result['bars_per_second']), file=sys.stderr)
+
+    output = json.dumps(results, indent=1, sort_keys=True)
+    if args.out:
+        with open(args.out, 'w') as outfile:
+            outfile.write(output)
+    else:
+        print(output)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as outfile:
+            outfile.write(output)
+    elif os.path.isfile(args.baseline):
+        with open(args.baseline, 'r') as infile:
+            regressions = compare(results, json.load(infile), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+def parse_args(pargs=None):
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Throughput and memory benchmarks of the strategy hot paths',
+    )
+
+    parser.add_argument('--strategies', default=','.join(strategies),
+                        help='Comma separated strategy class names')
+
+    parser.add_argument('--symbols', default='1,10',
+                        help='Comma separated universe sizes')
+
+    parser.add_argument('--bars', default='10000',
+                        help='Comma separated numbers of bars per symbol')
+
+    parser.add_argument('--no-runonce', dest='runonce', action='store_false', default=True,
+                        help='Run the strategies bar by bar (next) instead of the vectorized runonce mode')
+
+    parser.add_argument('--out', default='',
+                        help='File the JSON results are written to, stdout when empty')
+
+    parser.add_argument('--baseline', default=os.path.join(os.path.dirname(__file__), 'baseline.json'),
+                        help='Baseline JSON the results are compared against')
+
+    parser.add_argument('--save-baseline', action='store_true', default=False,
+                        help='Store the results as the new baseline instead of comparing')
+
+    parser.add_argument('--tolerance', default=0.1, type=float,
+                        help='Allowed relative throughput drop or peak RSS growth')
+
+    return parser.parse_args(pargs)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,47 @@
+import argparse
+import os
+import time
+
+from domain.data import load_columns
+from domain.shared import SharedMarketData, save_manifest
+
+
+def run(args=None):
+    args = parse_args(args)
+
+    columns = load_columns(period=args.period, filter_list=args.symbols.split(',') if args.symbols else [])
+    with SharedMarketData(columns) as plane:
+        save_manifest(plane.manifest, args.manifest)
+        rows = sum(entry['rows'] for entry in plane.manifest.values())
+        print('Serving {} symbols, {} bars, manifest {}'.format(len(plane.manifest), rows, args.manifest))
+
+        # the blocks live as long as this process, workers attach and detach at will
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(args.manifest)
+
+
+def parse_args(pargs=None):
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Loads the market data once into shared memory for the backtest workers',
+    )
+
+    parser.add_argument('--period', default='1m',
+                        help='Bar period of the data to load')
+
+    parser.add_argument('--symbols', default='',
+                        help='Comma separated symbols, all of them when empty')
+
+    parser.add_argument('--manifest', default='market_data.json',
+                        help='File the shared memory manifest is written to')
+
+    return parser.parse_args(pargs)
+
+
+if __name__ == '__main__':
+    run()
@@ -1,45 +1,103 @@
 import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from domain.data import EPOCH_ORDINAL, NS_PER_DAY
+
+MS_PER_DAY = NS_PER_DAY // 10 ** 6
+
+
+class ColumnBuffer:
+    """Growable typed buffer with one row per recorded bar, or per period when ``freq`` is set"""
+
+    def __init__(self, width, freq=None, dtype=np.float64, capacity=4096):
+        self.index = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty((capacity, width), dtype=dtype)
+        self.size = 0
+        self.freq = pd.Timedelta(freq).value if freq else None
+        self.bucket = None
+
+    def append(self, num, row):
+        # float days only resolve to ~10us, bars are stamped to the millisecond
+        ns = int(round((num - EPOCH_ORDINAL) * MS_PER_DAY)) * 10 ** 6
+        if self.freq is not None:
+            # a bar in the same period overwrites it, the period keeps its last value
+            bucket = ns // self.freq
+            if bucket == self.bucket:
+                self.values[self.size - 1] = row
+                return
+            self.bucket = bucket
+            ns = bucket * self.freq
+
+        if self.size == len(self.index):
+            self.index = np.resize(self.index, 2 * self.size)
+            self.values = np.resize(self.values, (2 * self.size, self.values.shape[1]))
+
+        self.index[self.size] = ns
+        self.values[self.size] = row
+        self.size += 1
+
+    def get_state(self):
+        return dict(index=self.index[:self.size].copy(), values=self.values[:self.size].copy(), bucket=self.bucket)
+
+    def set_state(self, state):
+        self.size = len(state['index'])
+        self.index = np.resize(state['index'], max(self.size, len(self.index)))
+        self.values = np.resize(state['values'], (max(self.size, len(self.values)), self.values.shape[1]))
+        self.bucket = state['bucket']
+
+    def frame(self, columns):
+        return pd.DataFrame(self.values[:self.size], index=pd.DatetimeIndex(self.index[:self.size]),
+                            columns=columns, copy=False)
 
 
 class AlphalensAnalyzer(bt.analyzers.Analyzer):
+    params = (('freq', '1D'),)
+
     def start(self):
         super(AlphalensAnalyzer, self).start()
+        self.assets = list(self.strategy.ranks.keys())
+        self.ranks = ColumnBuffer(len(self.assets), self.p.freq)
+        self.prices = ColumnBuffer(len(self.datas), self.p.freq)
 
     def next(self):
         if self.strategy.started:
-            for k, v in self.strategy.ranks.items():
-                self.ranks.append({'date': self.strategy.datetime.date(),
-                                   'value': v.get()[0], 'asset': k._name})
-            prices = {}
-            for data in self.datas:
-                prices[data._name] = data.close[0]
-            self.prices[self.strategy.datetime.date()] = prices
+            dt = self.strategy.datetime[0]
+            self.ranks.append(dt, [v[0] for v in self.strategy.ranks.values()])
+            self.prices.append(dt, [data.close[0] for data in self.datas])
 
-    def create_analysis(self):
-        self.rets = {}
-        self.prices = {}
-        self.ranks = []
-        self.vals = 0.0
+    def get_state(self):
+        return dict(ranks=self.ranks.get_state(), prices=self.prices.get_state())
 
-    def notify_cashvalue(self, cash, value):
-        self.vals = (cash, value)
-        self.rets[self.strategy.datetime.datetime()] = self.vals
+    def set_state(self, state):
+        self.ranks.set_state(state['ranks'])
+        self.prices.set_state(state['prices'])
 
     def get_analysis(self):
-        return self.ranks, self.prices
+        return (self.ranks.frame([d._name for d in self.assets]),
+                self.prices.frame([d._name for d in self.datas]))
 
 
 class QuantStatsAnalyzer(bt.analyzers.Analyzer):
+    params = (('freq', None),)
+
     def start(self):
         super(QuantStatsAnalyzer, self).start()
 
     def create_analysis(self):
-        self.rets = {}
+        self.rets = ColumnBuffer(2, self.p.freq)
         self.vals = 0.0
 
     def notify_cashvalue(self, cash, value):
         self.vals = (cash, value)
-        self.rets[self.strategy.datetime.datetime()] = self.vals
+        self.rets.append(self.strategy.datetime[0], self.vals)
+
+    def get_state(self):
+        return dict(rets=self.rets.get_state(), vals=self.vals)
+
+    def set_state(self, state):
+        self.rets.set_state(state['rets'])
+        self.vals = state['vals']
 
     def get_analysis(self):
-        return self.rets
+        return self.rets.frame(['cash', 'value'])
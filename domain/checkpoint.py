@@ -0,0 +1,205 @@
+import os
+import pickle
+
+import backtrader as bt
+
+# hooks that must not trade while the indicators are warmed up again
+guarded_hooks = ('next', 'notify_timer')
+# analyzer entry points the strategy calls on every bar
+warmup_analyzer_hooks = ('_prenext', '_nextstart', '_next', '_notify_cashvalue', '_notify_fund')
+
+
+def save_checkpoint(state, fname):
+    """Pickles ``state`` next to ``fname`` and moves it in place, a crash never leaves half a checkpoint"""
+    with open(fname + '.tmp', 'wb') as outfile:
+        pickle.dump(state, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(fname + '.tmp', fname)
+
+
+def load_checkpoint(fname):
+    with open(fname, 'rb') as infile:
+        return pickle.load(infile)
+
+
+class CheckpointAnalyzer(bt.analyzers.Analyzer):
+    '''
+    Writes the broker cash, positions, open trades and open orders, the
+    strategy state and the state of every analyzer implementing ``get_state``
+    to ``fname`` every ``every`` bars and when the run stops.
+
+    With ``resume`` the checkpoint in ``fname`` is read on start. The data
+    should begin a warm-up period before the checkpoint so the indicators
+    rebuild their buffers; until the checkpoint bar the strategy does not
+    trade, on that bar the saved state replaces whatever the warm-up built.
+    The other analyzers skip the warm-up and the checkpoint bar, which the
+    run before the checkpoint already counted; those without ``get_state``
+    start over from the first bar after it.
+    '''
+    params = dict(
+        fname='checkpoint.pkl',
+        every=100000,
+        resume=False,
+    )
+
+    def start(self):
+        super(CheckpointAnalyzer, self).start()
+        self.resume = load_checkpoint(self.p.fname) if self.p.resume else None
+        if self.resume is None:
+            return
+
+        strategy = self.strategy
+        hooks = {hook: getattr(strategy, hook) for hook in guarded_hooks}
+        resumefrom = self.resume['datetime']
+
+        def guard(hook):
+            def wrapper(*args, **kwargs):
+                if self.resume is None:
+                    return hooks[hook](*args, **kwargs)
+                if strategy.datetime[0] < self.resume['datetime']:
+                    return
+                # the checkpoint bar already ran before the checkpoint was written
+                replayed = strategy.datetime[0] == self.resume['datetime']
+                self.restore()
+                if not replayed:
+                    return hooks[hook](*args, **kwargs)
+            return wrapper
+
+        def skip(method):
+            def wrapper(*args, **kwargs):
+                if strategy.datetime[0] > resumefrom:
+                    return method(*args, **kwargs)
+            return wrapper
+
+        for hook in guarded_hooks:
+            setattr(strategy, hook, guard(hook))
+        for analyzer in strategy.analyzers:
+            if analyzer is not self:
+                for hook in warmup_analyzer_hooks:
+                    setattr(analyzer, hook, skip(getattr(analyzer, hook)))
+
+    def next(self):
+        if self.resume is None and len(self.strategy) % self.p.every == 0:
+            save_checkpoint(self.snapshot(), self.p.fname)
+
+    def stop(self):
+        if self.resume is None:
+            save_checkpoint(self.snapshot(), self.p.fname)
+
+    def analyzers(self):
+        return [(name, analyzer) for name, analyzer in self.strategy.analyzers.getitems()
+                if analyzer is not self and hasattr(analyzer, 'get_state')]
+
+    def snapshot(self):
+        strategy = self.strategy
+        broker = strategy.broker
+        return dict(
+            datetime=strategy.datetime[0],
+            cash=broker.get_cash(),
+            startingcash=broker.startingcash,
+            positions={d._name: (p.size, p.price) for d, p in broker.positions.items() if p.size},
+            trades=self.open_trades(),
+            orders=self.open_orders(),
+            strategy=strategy.get_state() if hasattr(strategy, 'get_state') else None,
+            analyzers={name: analyzer.get_state() for name, analyzer in self.analyzers()},
+        )
+
+    def open_trades(self):
+        """The open trade of every data and tradeid, closing a restored position must update it"""
+        trades = []
+        for data, tradeids in self.strategy._trades.items():
+            for tradeid, datatrades in tradeids.items():
+                if datatrades and datatrades[-1].isopen:
+                    t = datatrades[-1]
+                    trades.append(dict(name=data._name, tradeid=tradeid, size=t.size, price=t.price, value=t.value,
+                                       commission=t.commission, pnl=t.pnl, pnlcomm=t.pnlcomm, dtopen=t.dtopen,
+                                       long=t.long, barlen=len(data) - t.baropen))
+        return trades
+
+    def open_orders(self):
+        """Alive orders with what it takes to submit them again, ``oco`` is the index of the order they cancel with"""
+        broker = self.strategy.broker
+        orders = [o for o in broker.orders if o.alive()]
+        index = {o.ref: i for i, o in enumerate(orders)}
+        # the broker keeps the oco groups, every order maps to the ref of the first one of its group
+        ocos = {o.ref: broker._ocos.get(o.ref) for o in orders} if hasattr(broker, '_ocos') else {}
+        return [dict(name=o.data._name, size=o.created.size, price=o.created.price, plimit=o.created.pricelimit,
+                     exectype=o.exectype, valid=o.valid, trailamount=o.trailamount, trailpercent=o.trailpercent,
+                     oco=index.get(ocos.get(o.ref)) if ocos.get(o.ref, o.ref) != o.ref else None,
+                     tradeid=o.tradeid,
+                     triggered=getattr(o, 'triggered', False))
+                for o in orders]
+
+    def restore(self):
+        state, self.resume = self.resume, None
+        strategy = self.strategy
+        broker = strategy.broker
+
+        broker.set_cash(state['cash'])
+        broker.startingcash = state['startingcash']
+        for name, (size, price) in state['positions'].items():
+            broker.positions[strategy.getdatabyname(name)] = bt.Position(size, price)
+
+        for saved in state['trades']:
+            data = strategy.getdatabyname(saved['name'])
+            trade = bt.Trade(data=data, tradeid=saved['tradeid'], historyon=strategy._tradehistoryon)
+            for field in ('size', 'price', 'value', 'commission', 'pnl', 'pnlcomm', 'dtopen', 'long'):
+                setattr(trade, field, saved[field])
+            trade.baropen = len(data) - saved['barlen']
+            trade.isopen, trade.status = True, bt.Trade.Open
+            strategy._trades[data][saved['tradeid']].append(trade)
+
+        restored = []
+        for saved in state['orders']:
+            order = strategy.buy if saved['size'] > 0 else strategy.sell
+            oco = restored[saved['oco']] if saved['oco'] is not None and saved['oco'] < len(restored) else None
+            o = order(data=strategy.getdatabyname(saved['name']), size=abs(saved['size']), price=saved['price'],
+                      plimit=saved['plimit'], exectype=saved['exectype'],
+                      valid=bt.num2date(saved['valid']) if saved['valid'] else None,
+                      trailamount=saved['trailamount'], trailpercent=saved['trailpercent'],
+                      oco=oco, tradeid=saved['tradeid'], symbol=saved['name'])
+            # a new trailing order trails its price once more, the stop stays where the market had moved it
+            o.created.price, o.created.pricelimit = saved['price'], saved['plimit']
+            o.triggered = saved['triggered']
+            restored.append(o)
+
+        if state['strategy'] is not None:
+            strategy.set_state(state['strategy'])
+        for name, analyzer in self.analyzers():
+            if name in state['analyzers']:
+                analyzer.set_state(state['analyzers'][name])
+
+    def get_analysis(self):
+        return dict(fname=self.p.fname)
+
+
+class WarmupAnalyzer(bt.analyzers.Analyzer):
+    '''
+    Keeps the strategy from trading before ``tradefrom``. The data begins a
+    warm-up span earlier, the bars before ``tradefrom`` only prime the
+    indicators; the other analyzers do not see them either, so returns and
+    drawdowns start at ``tradefrom``.
+    '''
+    params = dict(
+        tradefrom=None,
+    )
+
+    def start(self):
+        super(WarmupAnalyzer, self).start()
+        strategy = self.strategy
+        tradefrom = bt.date2num(self.p.tradefrom)
+
+        def guard(method):
+            def wrapper(*args, **kwargs):
+                if strategy.datetime[0] >= tradefrom:
+                    return method(*args, **kwargs)
+            return wrapper
+
+        for hook in guarded_hooks:
+            setattr(strategy, hook, guard(getattr(strategy, hook)))
+        for analyzer in strategy.analyzers:
+            if analyzer is not self:
+                for hook in warmup_analyzer_hooks:
+                    setattr(analyzer, hook, guard(getattr(analyzer, hook)))
+
+    def get_analysis(self):
+        return dict(tradefrom=self.p.tradefrom)
@@ -1,10 +1,28 @@
 import backtrader as bt
 
+# Binance spot (maker, taker) fees by VIP level
+spot_fee_tiers = (
+    (0.0010, 0.0010),
+    (0.0009, 0.0010),
+    (0.0008, 0.0010),
+    (0.0007, 0.0010),
+    (0.0002, 0.0004),
+    (0.0002, 0.00035),
+    (0.0002, 0.0003),
+    (0.0002, 0.00025),
+    (0.0002, 0.0002),
+    (0.0002, 0.00017),
+)
+bnb_discount = 0.25
+
 
 class CryptoSpotCommissionInfo(bt.CommissionInfo):
     params = (
         ('stocklike', True),
         ('commtype', bt.CommInfoBase.COMM_PERC),  # apply % commission
+        ('tier', 0),  # Binance VIP level
+        ('maker', False),  # orders add liquidity, backtest market orders take it
+        ('bnb', False),  # fees paid in BNB
     )
 
     def __init__(self):
@@ -19,11 +37,34 @@ class CryptoSpotCommissionInfo(bt.CommissionInfo):
 
         super().__init__()
 
+        # the broker calls these for every position on every bar, params are resolved once here
+        maker, taker = spot_fee_tiers[self.p.tier]
+        self._fee = (maker if self.p.maker else taker) * ((1.0 - bnb_discount) if self.p.bnb else 1.0)
+        self._leverage = self.p.leverage
+
+    def get_leverage(self):
+        return self._leverage
+
     def getsize(self, price, cash):
-        return self.p.leverage * (cash / price)
+        return self._leverage * (cash / price)
+
+    def getoperationcost(self, size, price):
+        return abs(size) * price
+
+    def getvaluesize(self, size, price):
+        return size * price
+
+    def profitandloss(self, size, price, newprice):
+        return size * (newprice - price)
+
+    def cashadjust(self, size, price, newprice):
+        return 0.0
+
+    def _getcommission(self, size, price, pseudoexec):
+        return abs(size) * price * self._fee
 
     def getcommission(self, size, price):
-        return abs(size) * price * 0.001
+        return abs(size) * price * self._fee
 
 
 class CryptoContractCommissionInfo(bt.CommissionInfo):
@@ -44,8 +85,14 @@ class CryptoContractCommissionInfo(bt.CommissionInfo):
 
         super().__init__()
 
+        self._fee = self.p.commission * self.p.mult
+        self._leverage = self.p.leverage
+
+    def get_leverage(self):
+        return self._leverage
+
     def getsize(self, price, cash):
-        return self.p.leverage * (cash / price)
+        return self._leverage * (cash / price)
 
     def _getcommission(self, size, price, pseudoexec):
-        return abs(size) * self.p.commission * price * self.p.mult
+        return abs(size) * self._fee * price
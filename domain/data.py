@@ -1,14 +1,26 @@
 import os
 import glob
+import json
 from datetime import datetime
 import backtrader as bt
 import pandas as pd
 import numpy as np
 
-import pyarrow.parquet as pq
-
 import backtrader.feeds as btfeed
 
+data_directory = "/Users/umoh/Data/Binance"
+store_directory = os.path.join(data_directory, "store")
+# monthly 1m partitions written by api.kline_sync
+sync_directory = '/Volumes/Seagate Expansion Drive/binance/data'
+# written into every symbol directory of the store, the source file it was built from
+store_manifest = 'source.json'
+
+bar_columns = ('datetime', 'open', 'high', 'low', 'close', 'volume')
+
+# backtrader keeps datetimes as days since 0001-01-01 (the proleptic ordinal)
+NS_PER_DAY = 86400 * 10 ** 9
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
 
 class BinanceCsvDataFeed(btfeed.GenericCSVData):
     params = (
@@ -61,11 +73,320 @@ class PandasData(bt.feeds.PandasData):
     )
 
 
-def load_data_into_cerebro(cerebro, period='1d', start=None, end=None, filter_list=[], exclusion_list=[]):
-    for fname in glob.glob(os.path.join(f"/Users/umoh/Data/Binance/{period}", '*')):
+class ArrayDataFeed(btfeed.DataBase):
+    '''
+    Serves bars from a dict of equally sized NumPy columns, ``datetime`` as
+    int64 epoch nanoseconds plus ``open``, ``high``, ``low``, ``close`` and
+    ``volume``. The columns may be memory-mapped or float32 (see
+    ``compact_columns``). Only the rows between ``fromdate`` and ``todate``
+    are read, they are copied into the float64 lines of the feed.
+    '''
+
+    def start(self):
+        super(ArrayDataFeed, self).start()
+        columns = self.p.dataname
+
+        self._dt = columns['datetime']
+        self._first, self._end = 0, len(self._dt)
+        if self.p.fromdate is not None:
+            self._first = np.searchsorted(self._dt, to_ns(self.p.fromdate), side='left')
+        if self.p.todate is not None:
+            self._end = np.searchsorted(self._dt, to_ns(self.p.todate), side='right')
+
+        self._idx = self._first
+        self._columns = [(getattr(self.lines, name), columns[name]) for name in bar_columns[1:]]
+
+    def _load(self):
+        i = self._idx
+        if i >= self._end:
+            return False
+
+        self.lines.datetime[0] = self._dt[i] / NS_PER_DAY + EPOCH_ORDINAL
+        for line, column in self._columns:
+            line[0] = column[i]
+        self.lines.openinterest[0] = 0.0
+
+        self._idx = i + 1
+        return True
+
+    def preload(self):
+        if self._filters or self._ffilters or self._tzinput:
+            return super(ArrayDataFeed, self).preload()
+
+        # the rows are already in range and in order, each line is filled with one copy
+        rows = slice(self._idx, self._end)
+        values = [(self.lines.datetime, self._dt[rows] / NS_PER_DAY + EPOCH_ORDINAL),
+                  (self.lines.openinterest, np.zeros(self._end - self._idx))]
+        values.extend((line, column[rows]) for line, column in self._columns)
+        for line, column in values:
+            line.array.frombytes(np.ascontiguousarray(column, dtype=np.float64).tobytes())
+
+        self._idx = self._end
+        self.home()
+
+
+def align_columns(columns, start=None, end=None, fill='ffill'):
+    '''
+    Puts the bar columns of every symbol on one merged int64 ns timeline,
+    shared by all of them, so every feed has a bar on every step. Rows
+    before the first bar of a symbol are NaN. A gap is a flat bar at the
+    last close with no volume when ``fill`` is 'ffill', NaN when it is 'nan'.
+    '''
+    ranges = {}
+    for name, bars in columns.items():
+        first = 0 if start is None else np.searchsorted(bars['datetime'], to_ns(start), side='left')
+        last = len(bars['datetime']) if end is None else np.searchsorted(bars['datetime'], to_ns(end), side='right')
+        ranges[name] = slice(first, last)
+    timeline = np.unique(np.concatenate([bars['datetime'][ranges[name]] for name, bars in columns.items()]))
+    steps = np.arange(len(timeline))
+
+    aligned = {}
+    for name, bars in columns.items():
+        rows = np.searchsorted(timeline, bars['datetime'][ranges[name]])
+        out = dict(datetime=timeline)
+        for column in bar_columns[1:]:
+            values = np.full(len(timeline), np.nan, dtype=np.result_type(bars[column].dtype, np.float32))
+            values[rows] = bars[column][ranges[name]]
+            out[column] = values
+
+        if fill == 'ffill':
+            present = np.zeros(len(timeline), dtype=bool)
+            present[rows] = True
+            # the last real bar of every step, -1 before the symbol lists
+            previous = np.maximum.accumulate(np.where(present, steps, -1))
+            gaps = ~present & (previous >= 0)
+            close = out['close'][previous[gaps]]
+            for column in ('open', 'high', 'low', 'close'):
+                out[column][gaps] = close
+            out['volume'][gaps] = 0.0
+        aligned[name] = out
+    return timeline, aligned
+
+
+def compact_columns(columns, dtype=np.float32):
+    """Bar columns per symbol with ``dtype`` prices and volumes and int64 epoch-ns datetimes"""
+    return {name: dict(datetime=np.asarray(bars['datetime'], dtype=np.int64),
+                       **{column: np.asarray(bars[column], dtype=dtype) for column in bar_columns[1:]})
+            for name, bars in columns.items()}
+
+
+def align_datas(datas, line='close'):
+    '''
+    Puts ``line`` of every preloaded data feed on the union of their
+    timestamps as one (bars x datas) matrix. Gaps repeat the last value, as
+    a feed that does not tick keeps its last bar, and bars before the first
+    one of a feed are NaN.
+    '''
+    dts = [np.frombuffer(d.datetime.array, dtype=np.float64)[:d.buflen()] for d in datas]
+    timeline = np.unique(np.concatenate(dts))
+
+    matrix = np.full((len(timeline), len(datas)), np.nan)
+    for j, (d, dt) in enumerate(zip(datas, dts)):
+        matrix[np.searchsorted(timeline, dt), j] = np.frombuffer(getattr(d.lines, line).array,
+                                                                 dtype=np.float64)[:len(dt)]
+    matrix = pd.DataFrame(matrix).ffill().to_numpy()
+    return timeline, matrix
+
+
+def to_ns(dt):
+    return np.datetime64(pd.Timestamp(dt).tz_localize(None), 'ns').astype(np.int64)
+
+
+def symbol_name(fname, period):
+    if period == '1d':
+        return os.path.basename(fname).split('_')[1]
+    return os.path.basename(fname).replace('-', '').split('.')[0]
+
+
+def read_bars(fname, period):
+    if period == '1d':
+        df = pd.read_csv(fname, index_col=0, parse_dates=True)
+        df = df.iloc[:, :5]
+        df.columns = ['high', 'low', 'open', 'close', 'volume']
+    else:
+        import pyarrow.parquet as pq
+        df = pq.read_table(fname).to_pandas()
+    return df.sort_index()
+
+
+def index_column(schema):
+    """Name of the column the pandas index was stored in, ``timestamp`` for files written without pandas"""
+    metadata = schema.pandas_metadata or {}
+    for index in metadata.get('index_columns', []):
+        if isinstance(index, str):
+            return index
+    return 'timestamp'
+
+
+def read_minute_bars(path, start=None, end=None, columns=bar_columns[1:]):
+    """
+    Bars between ``start`` and ``end`` of a Parquet file or a directory of
+    Parquet partitions. The range and the columns are pushed down into Arrow,
+    files and row groups whose statistics fall outside of it are not read.
+    ``columns`` None reads every column of the files.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format='parquet')
+    index = index_column(dataset.schema)
+    field_type = dataset.schema.field(index).type
+
+    def bound(dt):
+        ts = pd.Timestamp(dt)
+        if getattr(field_type, 'tz', None) and ts.tz is None:
+            ts = ts.tz_localize(field_type.tz)
+        return pa.scalar(ts, type=field_type)
+
+    predicate = None
+    if start is not None:
+        predicate = ds.field(index) >= bound(start)
+    if end is not None:
+        upper = ds.field(index) <= bound(end)
+        predicate = upper if predicate is None else predicate & upper
+
+    table = dataset.to_table(columns=None if columns is None else [index] + list(columns), filter=predicate)
+    df = table.to_pandas()
+    # the pandas metadata restores the index unless the file was written without it
+    if index in df.columns:
+        df = df.set_index(index)
+    return df.sort_index()
+
+
+def write_minute_bars(df, fname, freq='M'):
+    """Writes ``df`` with one row group per ``freq`` period, so time-sliced reads skip whole periods"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = df.sort_index()
+    schema = pa.Table.from_pandas(df.iloc[:0]).schema
+    with pq.ParquetWriter(fname, schema) as writer:
+        for _, part in df.groupby(df.index.to_period(freq)):
+            writer.write_table(pa.Table.from_pandas(part, schema=schema), row_group_size=len(part))
+
+
+def regroup_minute_files(freq='M', filter_list=[], exclusion_list=[]):
+    """One-time rewrite of the 1m Parquet files with row groups per ``freq`` period, every column is kept"""
+    for fname in glob.glob(os.path.join(data_directory, '1m', '*.parquet')):
+        name = symbol_name(fname, '1m')
+        if name in exclusion_list or (len(filter_list) > 0 and name not in filter_list):
+            continue
+        write_minute_bars(read_minute_bars(fname, columns=None), fname + '.tmp', freq)
+        os.replace(fname + '.tmp', fname)
+
+
+def file_fingerprint(fname):
+    st = os.stat(fname)
+    return '%d-%d' % (st.st_size, st.st_mtime_ns)
+
+
+def store_symbol(fname, period, symbol_dir, dtype=np.float64):
+    df = read_bars(fname, period)
+    os.makedirs(symbol_dir, exist_ok=True)
+
+    np.save(os.path.join(symbol_dir, 'datetime.npy'),
+            df.index.values.astype('datetime64[ns]').astype(np.int64))
+    for column in bar_columns[1:]:
+        np.save(os.path.join(symbol_dir, column + '.npy'), df[column].to_numpy(dtype=dtype))
+
+    # written last, a symbol whose conversion was interrupted has none and is built again
+    with open(os.path.join(symbol_dir, store_manifest), 'w') as outfile:
+        json.dump(dict(source=fname, fingerprint=file_fingerprint(fname)), outfile)
+
+
+def build_bar_store(period='1d', filter_list=[], exclusion_list=[], store_dir=store_directory, dtype=np.float64):
+    """One-time conversion of the Binance CSV/Parquet files into per-symbol .npy columns, float32 halves the store"""
+    for fname in glob.glob(os.path.join(data_directory, period, '*')):
+        name = symbol_name(fname, period)
+        if name in exclusion_list or (len(filter_list) > 0 and name not in filter_list):
+            continue
+        store_symbol(fname, period, os.path.join(store_dir, period, name), dtype)
+
+
+def refresh_bar_store(period='1d', filter_list=[], exclusion_list=[], store_dir=store_directory):
+    """Rebuilds the symbols of the store that are missing or older than their source file, returns their names"""
+    # keep the dtype the store was built with
+    stored = glob.glob(os.path.join(store_dir, period, '*', 'close.npy'))
+    dtype = np.load(stored[0], mmap_mode='r').dtype if stored else np.float64
+
+    rebuilt = []
+    for fname in sorted(glob.glob(os.path.join(data_directory, period, '*'))):
+        name = symbol_name(fname, period)
+        if name in exclusion_list or (len(filter_list) > 0 and name not in filter_list):
+            continue
+
+        symbol_dir = os.path.join(store_dir, period, name)
+        manifest_file = os.path.join(symbol_dir, store_manifest)
+        if os.path.isfile(manifest_file):
+            with open(manifest_file, 'r') as infile:
+                if json.load(infile)['fingerprint'] == file_fingerprint(fname):
+                    continue
+
+        store_symbol(fname, period, symbol_dir, dtype)
+        rebuilt.append(name)
+    return rebuilt
+
+
+def open_bar_store(symbol_dir):
+    return {column: np.load(os.path.join(symbol_dir, column + '.npy'), mmap_mode='r') for column in bar_columns}
+
+
+def load_store_into_cerebro(cerebro, period='1d', start=None, end=None, filter_list=[], exclusion_list=[],
+                            store_dir=store_directory):
+    add_columns_to_cerebro(cerebro, load_columns(period, filter_list, exclusion_list, store_dir), start, end)
+
+
+def load_columns(period='1d', filter_list=[], exclusion_list=[], store_dir=store_directory, dtype=np.float64):
+    """
+    Bar columns per symbol, memory-mapped from the store in its own dtype
+    when there is one. Symbols whose source file changed since the store was
+    built are converted again first.
+    """
+    columns = {}
+    if os.path.isdir(os.path.join(store_dir, period)):
+        refresh_bar_store(period, filter_list, exclusion_list, store_dir)
+        for symbol_dir in sorted(glob.glob(os.path.join(store_dir, period, '*'))):
+            name = os.path.basename(symbol_dir)
+            if name in exclusion_list or (len(filter_list) > 0 and name not in filter_list):
+                continue
+            columns[name] = open_bar_store(symbol_dir)
+        return columns
+
+    for fname in sorted(glob.glob(os.path.join(data_directory, period, '*'))):
+        name = symbol_name(fname, period)
+        if name in exclusion_list or (len(filter_list) > 0 and name not in filter_list):
+            continue
+        df = read_bars(fname, period)
+        columns[name] = dict(datetime=df.index.values.astype('datetime64[ns]').astype(np.int64),
+                             **{column: df[column].to_numpy(dtype=dtype) for column in bar_columns[1:]})
+    return columns
+
+
+def add_columns_to_cerebro(cerebro, columns, start=None, end=None):
+    for name, bars in columns.items():
+        cerebro.adddata(ArrayDataFeed(dataname=bars, fromdate=start, todate=end, name=name))
+
+
+def add_aligned_columns_to_cerebro(cerebro, columns, start=None, end=None, fill='ffill'):
+    """Feeds over ``align_columns``, the clock advances every feed together one step at a time"""
+    _, aligned = align_columns(columns, start, end, fill)
+    add_columns_to_cerebro(cerebro, aligned)
+
+
+def load_data_into_cerebro(cerebro, period='1d', start=None, end=None, filter_list=[], exclusion_list=[],
+                           use_store=True):
+    if use_store and os.path.isdir(os.path.join(store_directory, period)):
+        return load_store_into_cerebro(cerebro, period, start, end, filter_list, exclusion_list)
+
+    if period not in ('1d', '1m'):
+        # coarser bars are derived from the 1m partitions and cached on disk
+        from domain.resample import load_resampled_into_cerebro
+        return load_resampled_into_cerebro(cerebro, period, start, end, filter_list, exclusion_list)
+
+    for fname in glob.glob(os.path.join(data_directory, period, '*')):
 
         if period == '1d':
-            name = os.path.basename(fname).split('_')[1]
+            name = symbol_name(fname, period)
             if name in exclusion_list:
                 pass
             if len(filter_list) == 0 or name in filter_list:
@@ -86,12 +407,12 @@ def load_data_into_cerebro(cerebro, period='1d', start=None, end=None, filter_li
                 )
                 cerebro.adddata(data)
         elif period == '1m':
-            name = os.path.basename(fname).replace('-', '').split('.')[0]
+            name = symbol_name(fname, period)
             if name in exclusion_list:
                 pass
 
             if len(filter_list) == 0 or name in filter_list:
-                df = pq.read_table(fname).to_pandas()
-                df = df.loc[pd.to_datetime(start): pd.to_datetime(end)]
+                # fname is a file or a directory of monthly partitions, only the range is read
+                df = read_minute_bars(fname, start, end)
                 data = PandasData(dataname=df, name=name)
                 cerebro.adddata(data)
@@ -1,10 +1,15 @@
+import math
+from array import array
+
 import backtrader as bt
 import numpy as np
-from scipy.stats import linregress
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
 
 @staticmethod
 def momentum_func(data):
+    from scipy.stats import linregress
     r = np.log(data)
     slope, _, rvalue, _, _ = linregress(np.arange(len(r)), r)
     # annualized = (1 + slope) ** 252
@@ -16,3 +21,135 @@ class Momentum(bt.ind.OperationN):
     lines = ('trend',)
     params = dict(period=20)
     func = momentum_func
+
+
+def momentum_score(sxy, sxx, syy):
+    # same result as linregress: annualized slope weighted by r squared
+    slope = sxy / sxx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_squared = np.where(syy > 0, sxy * sxy / (sxx * syy), 0.0)
+    annualized = (np.exp(slope * 365) - 1) * 100
+    return annualized * r_squared
+
+
+def window_momentum(windows):
+    """Momentum of every window along the last axis"""
+    period = windows.shape[-1]
+    x = np.arange(period) - (period - 1) / 2.0
+    y = np.log(windows)
+    y = y - y.mean(axis=-1, keepdims=True)
+    return momentum_score(y @ x, x @ x, np.einsum('...i,...i->...', y, y))
+
+
+def rolling_momentum(values, period, chunk=1 << 16):
+    """Momentum over a rolling window of ``period`` along the first axis"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(values.shape, np.nan)
+    if len(values) < period:
+        return out
+
+    windows = sliding_window_view(values, period, axis=0)
+    for i in range(0, len(windows), chunk):
+        out[i + period - 1:i + period - 1 + chunk] = window_momentum(windows[i:i + chunk])
+    return out
+
+
+def rolling_mean(values, period):
+    return pd.DataFrame(values).rolling(period).mean().to_numpy().reshape(np.shape(values))
+
+
+def rolling_std(values, period):
+    # population standard deviation, as bt.ind.StdDev
+    return pd.DataFrame(values).rolling(period).std(ddof=0).to_numpy().reshape(np.shape(values))
+
+
+def pct_change(values, period):
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(values.shape, np.nan)
+    out[period:] = values[period:] / values[:-period] - 1.0
+    return out
+
+
+def roc(values, period):
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(values.shape, np.nan)
+    out[period:] = (values[period:] - values[:-period]) / values[:-period]
+    return out
+
+
+def atr(high, low, close, period):
+    # Wilder smoothing of the true range seeded with its SMA, as bt.ind.ATR
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+
+    prev_close = close[:-1]
+    true_range = np.maximum(high[1:], prev_close) - np.minimum(low[1:], prev_close)
+    seed = true_range[:period].mean()
+    alpha = 1.0 / period
+
+    from scipy.signal import lfilter
+    out[period] = seed
+    out[period + 1:], _ = lfilter([alpha], [1.0, alpha - 1.0], true_range[period:], zi=[(1.0 - alpha) * seed])
+    return out
+
+
+class RollingMomentum(bt.Indicator):
+    '''
+    Same output as ``Momentum`` computed from rolling sums of the log prices.
+
+    Streaming (``next``) costs O(1) per bar, the sums are recomputed from the
+    window every ``resync`` bars to keep the rounding error bounded. Preloaded
+    data (``once``) goes through ``rolling_momentum`` in a single NumPy pass.
+    '''
+    lines = ('trend',)
+    params = dict(period=20, resync=1000)
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+
+        period = self.p.period
+        self._sxx = period * (period * period - 1) / 12.0
+        self._xmean = (period - 1) / 2.0
+
+    def _resync(self):
+        # sums are kept relative to a recent log price so they stay small
+        y = np.log(np.asarray(self.data.get(size=self.p.period)))
+        self._ref = y[0]
+        y = y - self._ref
+        self._sy = y.sum()
+        self._syy = y @ y
+        self._sxy = np.arange(self.p.period) @ y
+        self._count = 0
+
+    def nextstart(self):
+        self._resync()
+        self._score()
+
+    def next(self):
+        self._count += 1
+        if self._count >= self.p.resync:
+            self._resync()
+        else:
+            period = self.p.period
+            y_new = math.log(self.data[0]) - self._ref
+            y_old = math.log(self.data[-period]) - self._ref
+            self._sy += y_new - y_old
+            self._syy += y_new * y_new - y_old * y_old
+            self._sxy += period * y_new - self._sy
+
+        self._score()
+
+    def _score(self):
+        period = self.p.period
+        sxy = self._sxy - self._xmean * self._sy
+        syy = self._syy - self._sy * self._sy / period
+        r_squared = sxy * sxy / (self._sxx * syy) if syy > 0 else 0.0
+        self.lines.trend[0] = (math.exp(sxy / self._sxx * 365) - 1) * 100 * r_squared
+
+    def once(self, start, end):
+        period = self.p.period
+        src = np.frombuffer(self.data.array, dtype=np.float64)
+        first = max(start - period + 1, 0)
+        trend = rolling_momentum(src[first:end], period)[start - first:]
+        self.lines.trend.array[start:end] = array('d', trend)
@@ -0,0 +1,170 @@
+import collections
+import contextlib
+import hashlib
+import os
+from array import array
+
+import backtrader as bt
+import numpy as np
+
+from domain.data import data_directory
+from domain.indicator import atr, pct_change, roc, rolling_momentum, rolling_std
+
+cache_directory = os.path.join(data_directory, 'indicators')
+
+
+class IndicatorCache:
+    '''
+    LRU of indicator outputs in memory, backed by memory-mapped .npy files in
+    ``directory``. ``maxsize`` bounds the arrays kept in memory, ``max_bytes``
+    the files on disk: after every write the least recently used files, by
+    modification time, are removed until the directory fits. A disk hit
+    touches its file. ``max_bytes=None`` never removes a file; ``clear``
+    empties the memory and the directory.
+    '''
+
+    def __init__(self, directory=cache_directory, maxsize=512, max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+
+    def key(self, symbol, name, params, fingerprint):
+        return hashlib.sha1(repr((symbol, name, sorted(params.items()), fingerprint)).encode()).hexdigest()
+
+    def get(self, key, compute):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        fname = os.path.join(self.directory, key + '.npy')
+        try:
+            os.utime(fname)
+        except FileNotFoundError:
+            os.makedirs(self.directory, exist_ok=True)
+            # written under a temporary name so concurrent workers never read a partial file
+            tmpname = '%s.%d.tmp.npy' % (fname[:-len('.npy')], os.getpid())
+            np.save(tmpname, compute())
+            os.replace(tmpname, fname)
+            self.prune(keep=key)
+
+        values = np.load(fname, mmap_mode='r')
+        self.entries[key] = values
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return values
+
+    def files(self):
+        """(mtime, size, key) of every cached file, other workers may remove them meanwhile"""
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith('.npy') and '.tmp.' not in entry.name:
+                    with contextlib.suppress(FileNotFoundError):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime_ns, stat.st_size, entry.name[:-len('.npy')]))
+        return files
+
+    def prune(self, keep=None):
+        """Removes the least recently used files until the directory fits in ``max_bytes``"""
+        if self.max_bytes is None:
+            return
+        files = sorted(self.files())
+        total = sum(size for _, size, _ in files)
+        for _, size, key in files:
+            if total <= self.max_bytes:
+                break
+            # the arrays in memory are mapped from their files
+            if key == keep or key in self.entries:
+                continue
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.directory, key + '.npy'))
+            total -= size
+
+    def clear(self):
+        self.entries.clear()
+        if os.path.isdir(self.directory):
+            for _, _, key in self.files():
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(self.directory, key + '.npy'))
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = IndicatorCache()
+    return _default_cache
+
+
+def fingerprint(arrays):
+    digest = hashlib.blake2b(digest_size=16)
+    for values in arrays:
+        digest.update(memoryview(values))
+    return digest.hexdigest()
+
+
+class CachedIndicator(bt.Indicator):
+    '''
+    Serves the output of a vectorized ``kernel`` over the ``fields`` lines of a
+    preloaded data feed from an ``IndicatorCache``. The kernel only runs when
+    the (symbol, kernel, kwargs, source bars) key is not cached yet.
+
+    The kernel sees the whole history at once, runs without preload (live
+    feeds, ``exactbars``) only hold part of it and are refused.
+    '''
+    lines = ('value',)
+    params = dict(kernel=None, kwargs=None, fields=('close',), minperiod=1, cache=None)
+
+    def __init__(self):
+        owner = self._owner
+        while not isinstance(owner, bt.Strategy):
+            owner = owner._owner
+        if not owner.env._dopreload:
+            raise ValueError('CachedIndicator computes from the whole history and needs preloaded data, '
+                             'not live feeds or exactbars')
+
+        self.addminperiod(self.p.minperiod)
+        self._values = None
+
+    def values(self):
+        if self._values is None:
+            size = self.data.buflen()
+            sources = [np.frombuffer(getattr(self.data.lines, field).array, dtype=np.float64)[:size]
+                       for field in self.p.fields]
+            kwargs = self.p.kwargs or {}
+            cache = self.p.cache or default_cache()
+
+            key = cache.key(self.data._name, self.p.kernel.__name__, kwargs, fingerprint(sources))
+            self._values = cache.get(key, lambda: self.p.kernel(*sources, **kwargs))
+        return self._values
+
+    def next(self):
+        self.lines.value[0] = float(self.values()[len(self) - 1])
+
+    def once(self, start, end):
+        self.lines.value.array[start:end] = array('d', self.values()[start:end])
+
+
+def pct_change_stddev(close, pct_period, std_period):
+    return rolling_std(pct_change(close, pct_period), std_period)
+
+
+def cached_momentum(data, period, cache=None):
+    return CachedIndicator(data, kernel=rolling_momentum, kwargs=dict(period=period), minperiod=period, cache=cache)
+
+
+def cached_atr(data, period, cache=None):
+    return CachedIndicator(data, kernel=atr, kwargs=dict(period=period), fields=('high', 'low', 'close'),
+                           minperiod=period + 1, cache=cache)
+
+
+def cached_roc(data, period, cache=None):
+    return CachedIndicator(data, kernel=roc, kwargs=dict(period=period), minperiod=period + 1, cache=cache)
+
+
+def cached_pct_change_stddev(data, pct_period, std_period, cache=None):
+    return CachedIndicator(data, kernel=pct_change_stddev, kwargs=dict(pct_period=pct_period, std_period=std_period),
+                           minperiod=pct_period + std_period, cache=cache)
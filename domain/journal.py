@@ -0,0 +1,120 @@
+import logging
+import sys
+from array import array
+
+import backtrader as bt
+
+levels = dict(debug=logging.DEBUG, info=logging.INFO, warning=logging.WARNING, off=logging.CRITICAL + 10)
+
+ORDER_COMPLETED, ORDER_REJECTED, TRADE_CLOSED, MESSAGE = range(4)
+
+
+class TradeJournal:
+    '''
+    Columnar in-memory buffer of order and trade events.
+
+    Events below ``level`` are dropped before anything is stored, the buffer
+    is written to ``fname`` (stdout when None) every ``batch_size`` events and
+    the event strings are only formatted at that point.
+    '''
+
+    def __init__(self, level='info', fname=None, batch_size=1000):
+        self.level = levels[level] if isinstance(level, str) else level
+        self.fname = fname
+        self.batch_size = batch_size
+        self.clear()
+
+    def clear(self):
+        self.dt = array('d')
+        self.kind = array('b')
+        self.size = array('d')
+        self.price = array('d')
+        self.value = array('d')
+        self.comm = array('d')
+        self.symbol = []
+        self.text = []
+
+    def isenabled(self, level):
+        return level >= self.level
+
+    def record(self, level, kind, dt, symbol='', size=0.0, price=0.0, value=0.0, comm=0.0, text=''):
+        if level < self.level:
+            return
+
+        self.dt.append(dt)
+        self.kind.append(kind)
+        self.size.append(size)
+        self.price.append(price)
+        self.value.append(value)
+        self.comm.append(comm)
+        self.symbol.append(symbol)
+        self.text.append(text)
+
+        if len(self.dt) >= self.batch_size:
+            self.flush()
+
+    def format(self, i):
+        kind = self.kind[i]
+        if kind == ORDER_COMPLETED:
+            txt = '{} Order Completed - Symbol: {} Size: {} @Price: {} Value: {:.2f} Comm: {:.2f}'.format(
+                'Buy' if self.size[i] > 0 else 'Sell', self.symbol[i], self.size[i], self.price[i],
+                self.value[i], self.comm[i])
+        elif kind == ORDER_REJECTED:
+            txt = '{} Order {} - Symbol: {}'.format('Buy' if self.size[i] > 0 else 'Sell', self.text[i], self.symbol[i])
+        elif kind == TRADE_CLOSED:
+            txt = '{}, OPERATION PROFIT, GROSS {:.2f}, NET {:.2f}'.format(self.symbol[i], self.value[i], self.comm[i])
+        else:
+            txt = self.text[i]
+        return '%s, %s' % (bt.num2date(self.dt[i]).date().isoformat(), txt)
+
+    def flush(self):
+        if not len(self.dt):
+            return
+
+        lines = '\n'.join(self.format(i) for i in range(len(self.dt))) + '\n'
+        if self.fname is None:
+            sys.stdout.write(lines)
+        else:
+            with open(self.fname, 'a') as outfile:
+                outfile.write(lines)
+        self.clear()
+
+
+class JournalStrategy(bt.Strategy):
+    '''
+    Base strategy recording completed and rejected orders and closed trades
+    into a ``TradeJournal`` instead of printing each of them.
+    '''
+    params = dict(
+        journal_level='info',
+        journal_file=None,
+        journal_batch=1000,
+    )
+
+    def start(self):
+        self.journal = TradeJournal(self.p.journal_level, self.p.journal_file, self.p.journal_batch)
+
+    def stop(self):
+        self.journal.flush()
+
+    def notify_order(self, order):
+        if order.alive():
+            return
+
+        self.journal_order(order)
+
+    def journal_order(self, order):
+        symbol = order.info.get('symbol') or order.data._name
+        if order.status == order.Completed:
+            self.journal.record(logging.INFO, ORDER_COMPLETED, self.datetime[0], symbol, order.executed.size,
+                                order.executed.price, order.executed.value, order.executed.comm)
+        else:
+            self.journal.record(logging.WARNING, ORDER_REJECTED, self.datetime[0], symbol, order.created.size,
+                                text=order.getstatusname())
+
+    def journal_trade(self, trade):
+        self.journal.record(logging.INFO, TRADE_CLOSED, self.datetime[0], trade.data._name,
+                            value=trade.pnl, comm=trade.pnlcomm)
+
+    def log(self, txt, level=logging.INFO):
+        self.journal.record(level, MESSAGE, self.datetime[0], text=txt)
@@ -0,0 +1,219 @@
+import asyncio
+import collections
+import json
+import threading
+import time
+
+import backtrader as bt
+import backtrader.feeds as btfeed
+
+from domain.data import EPOCH_ORDINAL, NS_PER_DAY
+
+stream_url = 'wss://stream.binance.com:9443'
+
+interval_seconds = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}
+
+
+def kline_event(symbol, interval, columns, i):
+    """Binance kline stream event of the closed bar ``i`` of ``columns``"""
+    start = int(columns['datetime'][i]) // 10 ** 6
+    return {
+        'e': 'kline', 'E': int(time.time() * 1000), 's': symbol,
+        'k': {'t': start, 'T': start + interval_seconds[interval] * 1000 - 1, 's': symbol, 'i': interval,
+              'o': repr(float(columns['open'][i])), 'h': repr(float(columns['high'][i])),
+              'l': repr(float(columns['low'][i])), 'c': repr(float(columns['close'][i])),
+              'v': repr(float(columns['volume'][i])), 'x': True},
+    }
+
+
+class ReplaySource:
+    '''
+    Replays the bars of a dict of columns as kline events, one every ``delay``
+    seconds. A stand-in for the exchange stream in paper runs and tests.
+    '''
+
+    def __init__(self, columns, symbol, interval='1m', delay=0.0):
+        self.columns = columns
+        self.symbol = symbol
+        self.interval = interval
+        self.delay = delay
+
+    async def events(self):
+        for i in range(len(self.columns['datetime'])):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield kline_event(self.symbol, self.interval, self.columns, i)
+
+
+class WebsocketSource:
+    '''
+    Kline events of one symbol from the Binance websocket stream, or from any
+    server speaking the same protocol at ``url`` such as ``replay_server``.
+    '''
+
+    def __init__(self, symbol, interval='1m', url=stream_url, retries=5):
+        self.symbol = symbol
+        self.interval = interval
+        self.url = url
+        self.retries = retries
+
+    async def events(self):
+        import aiohttp
+
+        stream = '%s/ws/%s@kline_%s' % (self.url, self.symbol.lower(), self.interval)
+        for attempt in range(self.retries):
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async with session.ws_connect(stream, heartbeat=30) as ws:
+                        async for msg in ws:
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                yield json.loads(msg.data)
+                            elif msg.type == aiohttp.WSMsgType.ERROR:
+                                break
+                # the server closed the stream, there is nothing more to read
+                return
+            except aiohttp.ClientConnectionError:
+                if attempt == self.retries - 1:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+
+async def replay_server(sources, host='127.0.0.1', port=8765):
+    """Serves ``ReplaySource`` objects keyed by symbol on the websocket paths of the Binance stream"""
+    from aiohttp import web
+
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        symbol = request.match_info['stream'].split('@')[0].upper()
+        async for event in sources[symbol].events():
+            await ws.send_str(json.dumps(event))
+        await ws.close()
+        return ws
+
+    app = web.Application()
+    app.router.add_get('/ws/{stream}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+class LiveKlineFeed(btfeed.DataBase):
+    '''
+    Live feed of the closed klines produced by ``source``, any object with an
+    async ``events()`` generator of Binance kline events.
+
+    The source runs on its own event loop in a background thread and hands
+    bars over through a deque, which needs no lock to append and pop, while
+    an Event wakes up the waiting feed as soon as a bar arrives. The
+    ``received`` line holds the wall time each bar arrived at, ``dequeued``
+    the wall time the feed handed it to backtrader; the difference is the
+    time it waited behind the bars before it.
+    '''
+    lines = ('received', 'dequeued')
+
+    params = (
+        ('source', None),
+        ('timeframe', bt.TimeFrame.Minutes),
+        ('qcheck', 0.5),
+    )
+
+    def islive(self):
+        return True
+
+    def haslivedata(self):
+        return bool(self._queue)
+
+    def start(self):
+        super(LiveKlineFeed, self).start()
+        self._queue = collections.deque()
+        self._ready = threading.Event()
+        self._done = False
+        self._error = None
+        self._thread = threading.Thread(target=asyncio.run, args=(self._consume(),), daemon=True)
+        self._thread.start()
+        self.put_notification(self.LIVE)
+
+    async def _consume(self):
+        try:
+            async for event in self.p.source.events():
+                k = event['k']
+                if not k['x']:
+                    continue
+                self._queue.append((k['t'] * 10 ** 6, float(k['o']), float(k['h']), float(k['l']),
+                                    float(k['c']), float(k['v']), time.time()))
+                self._ready.set()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._ready.set()
+
+    def _load(self):
+        if not self._queue:
+            if self._done:
+                if self._error is not None:
+                    raise self._error
+                return False
+            self._ready.wait(self._qcheck)
+            self._ready.clear()
+            if not self._queue:
+                return None
+
+        ns, o, h, l, c, v, received = self._queue.popleft()
+        self.lines.datetime[0] = ns / NS_PER_DAY + EPOCH_ORDINAL
+        self.lines.open[0] = o
+        self.lines.high[0] = h
+        self.lines.low[0] = l
+        self.lines.close[0] = c
+        self.lines.volume[0] = v
+        self.lines.openinterest[0] = 0.0
+        self.lines.received[0] = received
+        self.lines.dequeued[0] = time.time()
+        return True
+
+
+class LatencyAnalyzer(bt.analyzers.Analyzer):
+    '''
+    Time from the feed handing a bar to backtrader to each order the strategy
+    submits on it, for the datas that carry a ``dequeued`` line. The time the
+    bar waited in the feed queue before that is reported apart as ``queued``;
+    an unpaced ``ReplaySource`` delivers every bar at once and only that part
+    grows.
+    '''
+
+    def start(self):
+        super(LatencyAnalyzer, self).start()
+        self.latencies = []
+        self.queued = []
+        self.seen = 0
+
+    def next(self):
+        orders = self.strategy.broker.orders
+        if len(orders) == self.seen:
+            return
+        now = time.time()
+        for order in orders[self.seen:]:
+            if hasattr(order.data.lines, 'dequeued'):
+                self.latencies.append(now - order.data.dequeued[0])
+                self.queued.append(order.data.dequeued[0] - order.data.received[0])
+        self.seen = len(orders)
+
+    def get_analysis(self):
+        if not self.latencies:
+            return dict(orders=0)
+        return dict(orders=len(self.latencies), **latency_summary(self.latencies), queued=latency_summary(self.queued))
+
+
+def latency_summary(values):
+    values = sorted(values)
+    return dict(mean=sum(values) / len(values), p50=values[len(values) // 2], p99=values[int(len(values) * 0.99)],
+                max=values[-1])
+
+
+def add_live_datas(cerebro, sources):
+    """One ``LiveKlineFeed`` per source, named after its symbol, with bar sizes from its interval"""
+    for source in sources:
+        minutes = interval_seconds[source.interval] // 60
+        cerebro.adddata(LiveKlineFeed(source=source, name=source.symbol, compression=minutes))
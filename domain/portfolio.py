@@ -0,0 +1,36 @@
+import numpy as np
+
+
+def top_k(scores, k):
+    """Indices of the ``k`` highest scores in no particular order, NaN scores rank last"""
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= len(scores):
+        return np.arange(len(scores))
+    return np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+
+
+def rebalance_to_weights(strategy, datas, weights):
+    '''
+    Orders every data feed towards its target fraction of the portfolio.
+
+    All share deltas are computed at once against a single portfolio value
+    snapshot, sells are submitted before buys so the cash they free is there
+    when the buys execute. Sizes are fractional, as with
+    ``CryptoSpotCommissionInfo``.
+    '''
+    value = strategy.broker.getvalue()
+    prices = np.array([d.close[0] for d in datas])
+    sizes = np.array([strategy.getposition(d).size for d in datas])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        deltas = np.asarray(weights, dtype=np.float64) * value / prices - sizes
+    deltas[~np.isfinite(deltas)] = 0.0
+
+    orders = []
+    for i in np.flatnonzero(deltas < 0):
+        orders.append(strategy.sell(datas[i], size=-deltas[i], symbol=datas[i]._name))
+    for i in np.flatnonzero(deltas > 0):
+        orders.append(strategy.buy(datas[i], size=deltas[i], symbol=datas[i]._name))
+    return orders
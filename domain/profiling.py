@@ -0,0 +1,119 @@
+import collections
+import math
+import time
+
+import backtrader as bt
+
+strategy_hooks = ('next', 'notify_order', 'notify_trade', 'notify_timer', 'order_target_percent')
+analyzer_hooks = ('next', 'notify_cashvalue', 'notify_fund', 'notify_order', 'notify_trade')
+
+# durations are counted in log buckets from 100ns to 100s, 20 a decade puts percentiles within 12%
+min_duration = 1e-7
+buckets_per_decade = 20
+bucket_count = 9 * buckets_per_decade + 2
+
+
+class HookTimings:
+    """Calls, total, max and a log-bucket histogram of call durations, the same size however long the run"""
+    __slots__ = ('calls', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * bucket_count
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        i = 0
+        if seconds > min_duration:
+            i = min(int(math.log10(seconds / min_duration) * buckets_per_decade) + 1, bucket_count - 1)
+        self.buckets[i] += 1
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the ``q`` percentile, never above the slowest call"""
+        rank = q / 100.0 * self.calls
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return min(min_duration * 10 ** (i / buckets_per_decade), self.max)
+        return self.max
+
+
+class HookProfiler:
+    """Replaces methods on instances with wrappers timing every call"""
+
+    def __init__(self):
+        self.timings = collections.OrderedDict()
+
+    def wrap(self, obj, name, label):
+        method = getattr(obj, name)
+        add = self.timings.setdefault(label, HookTimings()).add
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            t = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                add(clock() - t)
+
+        setattr(obj, name, wrapper)
+
+    def stats(self):
+        stats = {}
+        for label, timings in self.timings.items():
+            if not timings.calls:
+                continue
+            stats[label] = dict(calls=timings.calls, total=timings.total, mean=timings.total / timings.calls,
+                                p50=timings.percentile(50), p95=timings.percentile(95),
+                                p99=timings.percentile(99), max=timings.max)
+        return stats
+
+    def report(self):
+        stats = sorted(self.stats().items(), key=lambda item: item[1]['total'], reverse=True)
+        lines = ['{:<48} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+            'hook', 'calls', 'total s', 'mean us', 'p50 us', 'p95 us', 'p99 us')]
+        for label, s in stats:
+            lines.append('{:<48} {:>10} {:>10.3f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+                label, s['calls'], s['total'], s['mean'] * 1e6, s['p50'] * 1e6, s['p95'] * 1e6, s['p99'] * 1e6))
+        return '\n'.join(lines)
+
+
+class ProfilingAnalyzer(bt.analyzers.Analyzer):
+    '''
+    Opt-in hot-path profiler. On start it instruments the strategy lifecycle
+    hooks, the commission schemes of the broker, the sizer and every other
+    analyzer of the strategy.
+    '''
+
+    def start(self):
+        super(ProfilingAnalyzer, self).start()
+        self.profiler = HookProfiler()
+        strategy = self.strategy
+        name = type(strategy).__name__
+
+        for hook in strategy_hooks:
+            self.profiler.wrap(strategy, hook, '%s.%s' % (name, hook))
+
+        for comminfo in set(strategy.broker.comminfo.values()):
+            self.profiler.wrap(comminfo, 'getcommission', '%s.getcommission' % type(comminfo).__name__)
+
+        sizer = strategy.getsizer()
+        self.profiler.wrap(sizer, '_getsizing', '%s._getsizing' % type(sizer).__name__)
+
+        for analyzer in strategy.analyzers:
+            if analyzer is self:
+                continue
+            for hook in analyzer_hooks:
+                self.profiler.wrap(analyzer, hook, '%s.%s' % (type(analyzer).__name__, hook))
+
+    def get_analysis(self):
+        return self.profiler.stats()
+
+    def report(self):
+        return self.profiler.report()
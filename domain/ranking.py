@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from domain.indicator import window_momentum
+
+
+class MomentumRanking:
+    '''
+    Ring buffer of the last ``window`` closes of every data feed. Every bar is
+    written twice, at ``pos`` and ``pos + window``, so the window oldest bar
+    first is always the contiguous view ``buffer[pos:pos + window]`` and
+    reading it copies nothing.
+    '''
+
+    def __init__(self, datas, window):
+        self.datas = datas
+        self.names = [d._name for d in datas]
+        self.columns = {name: i for i, name in enumerate(self.names)}
+        self.window = window
+        self.buffer = np.full((2 * window, len(datas)), np.nan)
+        self.pos = 0
+        self.count = 0
+
+    def update(self):
+        row = self.buffer[self.pos]
+        for i, d in enumerate(self.datas):
+            row[i] = d.close[0]
+        self.buffer[self.pos + self.window] = row
+        self.pos = (self.pos + 1) % self.window
+        self.count += 1
+
+    def isfull(self):
+        return self.count >= self.window
+
+    def closes(self):
+        """(window x datas) view of the closes, only valid until the next ``update``"""
+        return self.buffer[self.pos:self.pos + self.window]
+
+    def scores(self):
+        return window_momentum(self.closes().T)
+
+    def volatility(self, columns):
+        """Standard deviation of the bar returns over the window of the ``columns`` datas"""
+        closes = self.closes()[:, columns]
+        return np.std(closes[1:] / closes[:-1] - 1.0, axis=0, ddof=1)
+
+    def history(self):
+        # a labelled copy, for the callers that index by symbol
+        return pd.DataFrame(self.closes(), columns=self.names)
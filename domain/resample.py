@@ -0,0 +1,109 @@
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from domain.data import ArrayDataFeed, bar_columns, data_directory, file_fingerprint, sync_directory
+
+# every rule divides the next one, so each level is built from the previous one
+resample_rules = ('5m', '15m', '1h', '4h', '1d')
+cache_directory = os.path.join(data_directory, 'resampled')
+
+
+def resample_columns(columns, rule):
+    """OHLCV bars of ``rule`` from finer bars in a single pass of ufunc reductions"""
+    ns = pd.Timedelta(rule).value
+    bucket = columns['datetime'] // ns
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bucket)] - 1
+
+    return dict(
+        datetime=bucket[starts] * ns,
+        open=columns['open'][starts],
+        high=np.maximum.reduceat(columns['high'], starts),
+        low=np.minimum.reduceat(columns['low'], starts),
+        close=columns['close'][ends],
+        volume=np.add.reduceat(columns['volume'], starts),
+    )
+
+
+def frame_to_columns(df):
+    columns = {column: df[column].to_numpy(dtype=np.float64) for column in bar_columns[1:]}
+    columns['datetime'] = df.index.values.astype('datetime64[ns]').astype(np.int64)
+    return columns
+
+
+def columns_to_frame(columns):
+    index = pd.DatetimeIndex(columns['datetime'].astype('datetime64[ns]'), name='timestamp')
+    return pd.DataFrame({column: columns[column] for column in bar_columns[1:]}, index=index)
+
+
+def update_cache(symbol, source_root=sync_directory, cache_root=cache_directory):
+    """
+    Brings the resampled partitions of ``symbol`` in line with its monthly 1m
+    partitions. Only the months whose source file changed, or whose cache
+    files are gone, are rebuilt.
+    """
+    manifest_file = os.path.join(cache_root, symbol + '.json')
+    manifest = {}
+    if os.path.isfile(manifest_file):
+        with open(manifest_file, 'r') as infile:
+            manifest = json.load(infile)
+
+    sources = {os.path.basename(fname)[:-len('.parquet')]: fname
+               for fname in glob.glob(os.path.join(source_root, '1m', symbol, '*.parquet'))}
+
+    rebuilt = []
+    for month, fname in sorted(sources.items()):
+        key = file_fingerprint(fname)
+        outputs = [os.path.join(cache_root, rule, symbol, month + '.parquet') for rule in resample_rules]
+        if manifest.get(month) == key and all(os.path.isfile(output) for output in outputs):
+            continue
+
+        columns = frame_to_columns(pd.read_parquet(fname).sort_index())
+        for rule in resample_rules:
+            columns = resample_columns(columns, rule)
+            directory = os.path.join(cache_root, rule, symbol)
+            os.makedirs(directory, exist_ok=True)
+            columns_to_frame(columns).to_parquet(os.path.join(directory, month + '.parquet'))
+
+        manifest[month] = key
+        rebuilt.append(month)
+
+    for month in set(manifest) - set(sources):
+        for rule in resample_rules:
+            fname = os.path.join(cache_root, rule, symbol, month + '.parquet')
+            if os.path.isfile(fname):
+                os.remove(fname)
+        del manifest[month]
+
+    if rebuilt or len(manifest) != len(sources):
+        os.makedirs(cache_root, exist_ok=True)
+        with open(manifest_file, 'w') as outfile:
+            json.dump(manifest, outfile, indent=1, sort_keys=True)
+    return rebuilt
+
+
+def load_resampled(symbol, rule, source_root=sync_directory, cache_root=cache_directory):
+    """Bar columns of ``symbol`` at ``rule``, empty when it has no 1m partitions"""
+    update_cache(symbol, source_root, cache_root)
+    fnames = sorted(glob.glob(os.path.join(cache_root, rule, symbol, '*.parquet')))
+    if not fnames:
+        return dict(datetime=np.empty(0, dtype=np.int64),
+                    **{column: np.empty(0, dtype=np.float64) for column in bar_columns[1:]})
+    return frame_to_columns(pd.concat([pd.read_parquet(fname) for fname in fnames]))
+
+
+def load_resampled_into_cerebro(cerebro, rule, start=None, end=None, filter_list=[], exclusion_list=[],
+                                source_root=sync_directory, cache_root=cache_directory):
+    for symbol_dir in sorted(glob.glob(os.path.join(source_root, '1m', '*'))):
+        name = os.path.basename(symbol_dir)
+        if name in exclusion_list or (len(filter_list) > 0 and name not in filter_list):
+            continue
+
+        columns = load_resampled(name, rule, source_root, cache_root)
+        if len(columns['datetime']) == 0:
+            continue
+        cerebro.adddata(ArrayDataFeed(dataname=columns, fromdate=start, todate=end, name=name))
@@ -0,0 +1,92 @@
+import json
+import sys
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from domain.data import bar_columns
+
+# handles of the blocks attached by this process, the views are only valid while they are open
+attached = []
+
+
+def publish(columns, prefix=None):
+    '''
+    Copies the bar columns of every symbol into one shared memory block per
+    symbol, ``datetime`` as int64 followed by the float64 price columns.
+    Returns the blocks and the manifest other processes attach with.
+    '''
+    prefix = prefix or 'bt_%s' % uuid.uuid4().hex[:8]
+    blocks, manifest = [], {}
+    for i, (name, bars) in enumerate(columns.items()):
+        rows = len(bars['datetime'])
+        block = shared_memory.SharedMemory(name='%s_%d' % (prefix, i), create=True,
+                                           size=max(1, rows * 8 * len(bar_columns)))
+        view = np.ndarray((len(bar_columns), rows), dtype=np.float64, buffer=block.buf)
+        view[0].view(np.int64)[:] = bars['datetime']
+        for j, column in enumerate(bar_columns[1:], 1):
+            view[j] = bars[column]
+        blocks.append(block)
+        manifest[name] = dict(block=block.name, rows=rows)
+    return blocks, manifest
+
+
+def open_block(name):
+    """Attaches to a block without handing it to the resource tracker, which unlinks what it tracks at exit"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    register, resource_tracker.register = resource_tracker.register, lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def attach(manifest):
+    """Read-only bar columns per symbol over the shared memory blocks of ``manifest``"""
+    columns = {}
+    for name, entry in manifest.items():
+        block = open_block(entry['block'])
+        attached.append(block)
+
+        view = np.ndarray((len(bar_columns), entry['rows']), dtype=np.float64, buffer=block.buf)
+        view.flags.writeable = False
+        columns[name] = dict(datetime=view[0].view(np.int64),
+                             **{column: view[j] for j, column in enumerate(bar_columns[1:], 1)})
+    return columns
+
+
+def save_manifest(manifest, fname):
+    with open(fname, 'w') as outfile:
+        json.dump(manifest, outfile, indent=1)
+
+
+def load_manifest(fname):
+    with open(fname, 'r') as infile:
+        return json.load(infile)
+
+
+class SharedMarketData:
+    '''
+    Universe of bar columns published once into shared memory for the life
+    of the context. Workers attach to ``manifest`` and build ``ArrayDataFeed``
+    objects over the shared columns, the history exists once however many
+    of them run.
+    '''
+
+    def __init__(self, columns, prefix=None):
+        self.blocks, self.manifest = publish(columns, prefix)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
@@ -10,10 +10,23 @@ class CommInfoFractional(bt.CommissionInfo):
 class BinanceSizer(bt.Sizer):
     params = (('maximum_stake', 0.2),)
 
+    def __init__(self):
+        self._stake = self.p.maximum_stake
+        self._bar = None
+        self._value = None
+
+    def portfolio_value(self):
+        # one portfolio valuation per bar however many orders are sized in it
+        bar = len(self.strategy)
+        if bar != self._bar:
+            self._bar = bar
+            self._value = self.broker.getvalue()
+        return self._value
+
     def _getsizing(self, comminfo, cash, data, isbuy):
 
         if isbuy:
-            target = self.broker.getvalue() * self.p.maximum_stake  # Ideal total value of the position
+            target = self.portfolio_value() * self._stake  # Ideal total value of the position
             price = data.close[0]
             size_net = target / price  # How many shares are needed to get target
             size = size_net * 0.99
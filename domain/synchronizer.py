@@ -0,0 +1,64 @@
+import backtrader as bt
+import numpy as np
+
+
+def is_aligned(datas):
+    """True when every preloaded feed has the same datetimes, as after ``align_columns``"""
+    if not datas or any(d._filters or d._ffilters for d in datas):
+        return False
+    first = np.frombuffer(datas[0].lines.datetime.array, dtype=np.float64)
+    return all(np.array_equal(np.frombuffer(d.lines.datetime.array, dtype=np.float64), first) for d in datas[1:])
+
+
+class SynchronizedCerebro(bt.Cerebro):
+    '''
+    Cerebro for feeds sharing one merged timeline, see
+    ``domain.data.add_aligned_columns_to_cerebro``. In runonce mode a step
+    moves the line buffers of every feed one bar forward, instead of peeking
+    at the next datetime of each feed and comparing them. Feeds that are
+    not aligned, and the other modes, run as in Cerebro.
+    '''
+
+    def _runonce(self, runstrats):
+        if not is_aligned(self.datas):
+            return super(SynchronizedCerebro, self)._runonce(runstrats)
+
+        for strat in runstrats:
+            strat._once()
+            strat.reset()  # strat called next by next - reset lines
+
+        # data.advance nullifies and fills the tick prices with the bar on every
+        # step. Only the broker reads them and it falls back to the bar prices
+        # when they are None, the feeds carry no filters that update a bar, so
+        # leaving them None for the whole run executes the same orders and
+        # spares setting every tick attribute of every feed on every bar
+        for data in self.datas:
+            data._tick_nullify()
+
+        buffers = [line for data in self.datas for line in data.lines]
+        timeline = self.datas[0].lines.datetime.array
+        for dt0 in timeline:
+            for line in buffers:
+                line.idx += 1
+                line.lencount += 1
+
+            self._check_timers(runstrats, dt0, cheat=True)
+
+            if self.p.cheat_on_open:
+                for strat in runstrats:
+                    strat._oncepost_open()
+                    if self._event_stop:  # stop if requested
+                        return
+
+            self._brokernotify()
+            if self._event_stop:  # stop if requested
+                return
+
+            self._check_timers(runstrats, dt0, cheat=False)
+
+            for strat in runstrats:
+                strat._oncepost(dt0)
+                if self._event_stop:  # stop if requested
+                    return
+
+            self._next_writers(runstrats)
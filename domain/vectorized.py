@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+from domain.commission import bnb_discount, spot_fee_tiers
+from domain.data import to_ns
+from domain.indicator import pct_change, roc, rolling_mean, rolling_momentum, rolling_std
+
+
+def spot_fee(tier=0, maker=False, bnb=False):
+    """Fee rate of ``CryptoSpotCommissionInfo`` with the same params"""
+    fee = spot_fee_tiers[tier][0 if maker else 1]
+    return fee * ((1.0 - bnb_discount) if bnb else 1.0)
+
+
+def column_matrices(columns, lines=('open', 'close'), start=None, end=None):
+    '''
+    Puts ``lines`` of every symbol of a dict of bar columns on the union of
+    their timestamps, as ``align_datas`` does for data feeds. Returns the
+    int64 ns timeline and one (bars x symbols) matrix per line.
+    '''
+    dts = {}
+    for name, bars in columns.items():
+        first = 0 if start is None else np.searchsorted(bars['datetime'], to_ns(start), side='left')
+        last = len(bars['datetime']) if end is None else np.searchsorted(bars['datetime'], to_ns(end), side='right')
+        dts[name] = (first, last)
+    timeline = np.unique(np.concatenate([bars['datetime'][slice(*dts[name])] for name, bars in columns.items()]))
+
+    matrices = []
+    for line in lines:
+        matrix = np.full((len(timeline), len(columns)), np.nan)
+        for j, (name, bars) in enumerate(columns.items()):
+            rows = slice(*dts[name])
+            matrix[np.searchsorted(timeline, bars['datetime'][rows]), j] = bars[line][rows]
+        matrices.append(pd.DataFrame(matrix).ffill().to_numpy())
+    return timeline, matrices
+
+
+def minute_momentum_weights(close, momentum_period=10, vol_period=20, minimum_momentum=40, reserve=0.05):
+    """Target weights of MinuteMomentumStrategy / MultiMinuteMomentumStrategy, NaN where no order is placed"""
+    sma = rolling_mean(close, vol_period)
+    momentum = rolling_momentum(sma, momentum_period)
+    volatility = rolling_std(pct_change(sma, vol_period), vol_period)
+
+    selected = momentum > minimum_momentum
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.where(selected, 1 / (momentum * volatility), 0.0)
+        weights = weights / (weights.sum(axis=1, keepdims=True) + reserve)
+    return np.where(selected, weights, np.nan)
+
+
+def rebalancing_weights(close, selcperc=0.10, rperiod=1, vperiod=36, mperiod=12, reserve=0.05):
+    """Target weights of RebalancingStrategy, NaN until every symbol has its indicators"""
+    selnum = int(close.shape[1] * selcperc)
+    perctarget = (1.0 - reserve) % selnum  # as RebalancingStrategy
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ranks = 5 * roc(close, mperiod) / rolling_std(pct_change(close, rperiod), vperiod)
+
+    weights = np.zeros(close.shape)
+    scores = np.where(np.isnan(ranks), -np.inf, ranks)
+    top = np.argpartition(scores, close.shape[1] - selnum, axis=1)[:, close.shape[1] - selnum:]
+    np.put_along_axis(weights, top, perctarget, axis=1)
+    weights[np.isnan(ranks).any(axis=1)] = np.nan
+    return weights
+
+
+class VectorizedResult:
+    '''
+    Bar by bar cash, holdings and fills of a vectorized run with the
+    ``get_pf_items`` of the PyFolio analyzer, so ``exports.save_pf_items``
+    takes either.
+    '''
+
+    def __init__(self, timeline, symbols, closes, cash, positions, fills, startingcash):
+        self.index = pd.DatetimeIndex(timeline.astype('datetime64[ns]'))
+        self.symbols = list(symbols)
+        self.cash = pd.Series(cash, index=self.index, name='cash')
+        self.positions = pd.DataFrame(positions, index=self.index, columns=self.symbols)
+        self.values = pd.DataFrame(np.nan_to_num(positions * closes), index=self.index, columns=self.symbols)
+        self.value = (self.cash + self.values.sum(axis=1)).rename('value')
+        self.fills = fills
+        self.startingcash = startingcash
+
+    def transactions(self):
+        bar, symbol, size, price, _ = self.fills
+        return pd.DataFrame(dict(amount=size, price=price, sid=symbol,
+                                 symbol=np.array(self.symbols, dtype=object)[symbol], value=-size * price),
+                            index=pd.DatetimeIndex(self.index[bar], name='date'))
+
+    def get_pf_items(self):
+        daily = self.value.resample('1D').last().dropna()
+        returns = daily.pct_change()
+        returns.iloc[0] = daily.iloc[0] / self.startingcash - 1.0
+
+        positions = pd.concat([self.values, self.cash], axis=1).resample('1D').last().dropna()
+        gross_lev = (1.0 - self.cash / self.value).resample('1D').last().dropna()
+
+        returns.index = returns.index.tz_localize('UTC').rename('index')
+        positions.index = positions.index.tz_localize('UTC').rename('Datetime')
+        gross_lev.index = gross_lev.index.tz_localize('UTC').rename('index')
+        transactions = self.transactions()
+        transactions.index = transactions.index.tz_localize('UTC')
+        return returns.rename('return'), positions, transactions, gross_lev.rename('gross_lev')
+
+
+def submission_order(deltas, sells_first=True):
+    order = np.flatnonzero(deltas)
+    if sells_first:
+        return order[np.argsort(deltas[order] > 0, kind='stable')]
+    return order
+
+
+def run_vectorized(timeline, opens, closes, weights, cash=10000.0, fee=None, symbols=None, sells_first=True):
+    '''
+    Backtest of a (bars x symbols) target weight matrix. Weights decided at
+    the close of a bar are filled at the open of the next one, NaN weights
+    leave the symbol alone, as a strategy that places no order for it.
+
+    Share deltas are sized against the portfolio value at the deciding
+    close, as ``order_target_percent``, fees are those of
+    ``CryptoSpotCommissionInfo``. Orders are checked against the cash at the
+    deciding close and filled in turn, sells first as ``rebalance_to_weights``
+    or in symbol order as ``order_target_percent`` loops; an order the cash
+    cannot pay for is dropped, as the broker rejects it.
+
+    Between two rebalances the holdings are constant, only the bars that
+    decide or fill orders are visited one by one.
+    '''
+    fee = spot_fee() if fee is None else fee
+    startingcash = cash
+    marks = np.nan_to_num(closes)
+    bars, n = closes.shape
+    decide = np.flatnonzero(~np.isnan(weights).all(axis=1))
+    events = np.union1d(decide, decide[decide + 1 < bars] + 1)
+    deciding = np.zeros(bars, dtype=bool)
+    deciding[decide] = True
+
+    cash_hist = np.empty(bars)
+    pos_hist = np.empty((bars, n))
+    fills = ([], [], [], [], [])
+
+    pos = np.zeros(n)
+    pending = None
+    last = 0
+    for t in events:
+        pos_hist[last:t] = pos
+        cash_hist[last:t] = cash
+
+        if pending is not None:
+            sizes, prices = pending[order], opens[t, order]
+            costs = sizes * prices
+            comms = np.abs(costs) * fee
+            left = cash - np.cumsum(costs + comms)
+            if len(order) and left.min() < 0:
+                # a gap up at the open, fill in turn and drop the buys the cash no longer covers
+                filled = np.ones(len(order), dtype=bool)
+                for k in range(len(order)):
+                    if sizes[k] > 0 and costs[k] + comms[k] > cash:
+                        filled[k] = False
+                    else:
+                        cash -= costs[k] + comms[k]
+                order, sizes, prices, comms = order[filled], sizes[filled], prices[filled], comms[filled]
+            elif len(order):
+                cash = left[-1]
+            pos[order] += sizes
+            for column, values in zip(fills, (np.full(len(order), t), order, sizes, prices, comms)):
+                column.append(values)
+            pending = None
+
+        if deciding[t]:
+            value = cash + pos.dot(marks[t])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                pending = weights[t] * value / closes[t] - pos
+            pending[~np.isfinite(pending)] = 0.0
+            # the broker checks the orders in turn against the cash at the deciding close, a
+            # rejected order still counts against the ones after it
+            order = submission_order(pending, sells_first)
+            costs = pending[order] * closes[t, order]
+            order = order[cash - np.cumsum(costs + np.abs(costs) * fee) >= 0]
+        last = t
+
+    pos_hist[last:] = pos
+    cash_hist[last:] = cash
+
+    fills = tuple(np.concatenate(column).astype(dtype) if column else np.empty(0, dtype=dtype)
+                  for column, dtype in zip(fills, (np.intp, np.intp, np.float64, np.float64, np.float64)))
+    symbols = symbols if symbols is not None else ['Data%d' % i for i in range(n)]
+    return VectorizedResult(timeline, symbols, closes, cash_hist, pos_hist, fills, startingcash)
+
+
+def cross_check(result, strat, name='quantstats'):
+    """Largest relative gap between the vectorized portfolio value and a backtrader run recorded by QuantStatsAnalyzer"""
+    recorded = strat.analyzers.getbyname(name).get_analysis()['value']
+    value = result.value.reindex(recorded.index)
+    return float(np.nanmax(np.abs(value.to_numpy() / recorded.to_numpy() - 1.0)))
@@ -1,50 +1,110 @@
-import pandas as pd
-import quantstats as qs
+import functools
 import os
+from datetime import datetime
+
+import pandas as pd
+
+from domain.data import file_fingerprint
 
 export_directory = "/Users/umoh/Data/pyfolio/"
-if not os.path.isdir(export_directory):
-    os.mkdir(export_directory)
 
+benchmark_file = '/Users/umoh/Data/Binance/1d/Binance_BTCUSDT_1d.csv'
+
+
+def load_benchmark():
+    """The benchmark bars, read again whenever the source file changes"""
+    return read_benchmark(benchmark_file, file_fingerprint(benchmark_file))
+
+
+@functools.lru_cache(maxsize=1)
+def read_benchmark(fname, fingerprint):
+    return pd.read_csv(fname, parse_dates=True, index_col=0)
+
+
+def new_run_id():
+    return datetime.now().strftime('%Y%m%dT%H%M%S%f')
+
+
+def save_artifacts(artifacts, run_id=None, export_format='parquet'):
+    """
+    Writes each artifact to <export_directory>/<name>/run_id=<run_id>/ so every
+    artifact is one hive-partitioned Parquet dataset that can be filtered by
+    run id. The pickle format keeps the old flat <name>.pkl files, which are
+    not partitioned. Either way the run id is returned.
+    """
+    run_id = run_id or new_run_id()
+    if export_format == 'pickle':
+        os.makedirs(export_directory, exist_ok=True)
+        for name, obj in artifacts.items():
+            pd.to_pickle(obj, os.path.join(export_directory, name + ".pkl"))
+        return run_id
+
+    for name, obj in artifacts.items():
+        df = obj.to_frame(name=obj.name or name) if isinstance(obj, pd.Series) else obj
+        directory = os.path.join(export_directory, name, 'run_id=%s' % run_id)
+        os.makedirs(directory, exist_ok=True)
+        df.to_parquet(os.path.join(directory, 'part-0.parquet'))
+    return run_id
+
+
+def save_for_pyfolio(strat, run_id=None, export_format='parquet'):
+    return save_pf_items(strat.analyzers.getbyname('pyfolio').get_pf_items(), run_id, export_format)
+
+
+def save_pf_items(pf_items, run_id=None, export_format='parquet'):
+    """Saves the (returns, positions, transactions, gross_lev) tuple of a PyFolio analyzer or a vectorized run"""
+    returns, positions, transactions, gross_lev = pf_items
+
+    artifacts = dict(returns=returns, positions=positions, transactions=transactions, gross_lev=gross_lev)
+    if export_format == 'pickle':
+        artifacts['benchmark'] = load_benchmark().tz_localize(tz='utc')
+    else:
+        save_benchmark()
+
+    return save_artifacts(artifacts, run_id, export_format)
 
-def save_for_pyfolio(strat):
-    pyfolio = strat.analyzers.getbyname('pyfolio')
-    returns, positions, transactions, gross_lev = pyfolio.get_pf_items()
 
-    benchmark = pd.read_csv('/Users/umoh/Data/Binance/1d/Binance_BTCUSDT_1d.csv', parse_dates=True, index_col=0)
-    benchmark = benchmark.tz_localize(tz='utc')
+def save_benchmark():
+    """
+    Writes the benchmark once outside the run partitions, it is the same for
+    every run. It is written again when the source file changed since, the
+    fingerprint of the source it came from is kept next to it.
+    """
+    benchmark = os.path.join(export_directory, "benchmark.parquet")
+    fingerprint_file = os.path.join(export_directory, "benchmark.fingerprint")
+    fingerprint = file_fingerprint(benchmark_file)
 
-    pd.to_pickle(returns, os.path.join(export_directory, "returns.pkl"))
-    pd.to_pickle(positions, os.path.join(export_directory, "positions.pkl"))
-    pd.to_pickle(transactions, os.path.join(export_directory, "transactions.pkl"))
-    pd.to_pickle(gross_lev, os.path.join(export_directory, "gross_lev.pkl"))
-    pd.to_pickle(benchmark, os.path.join(export_directory, "benchmark.pkl"))
+    if os.path.isfile(benchmark) and os.path.isfile(fingerprint_file):
+        with open(fingerprint_file, 'r') as infile:
+            if infile.read() == fingerprint:
+                return
 
+    os.makedirs(export_directory, exist_ok=True)
+    load_benchmark().tz_localize(tz='utc').to_parquet(benchmark + '.tmp')
+    os.replace(benchmark + '.tmp', benchmark)
+    with open(fingerprint_file, 'w') as outfile:
+        outfile.write(fingerprint)
 
-def save_for_alphalens(strat):
-    rankings, price = strat.analyzers.getbyname("alphalens").get_analysis()
-    df = pd.DataFrame(rankings)
-    df = df.set_index(['date', 'asset'])
 
-    price_df = pd.DataFrame(price).T
+def save_for_alphalens(strat, run_id=None, export_format='parquet'):
+    rankings, price_df = strat.analyzers.getbyname("alphalens").get_analysis()
+    factor = rankings.stack()
+    factor.index.names = ['date', 'asset']
 
-    pd.to_pickle(df.squeeze(), os.path.join(export_directory, "alphalens.pkl"))
-    pd.to_pickle(price_df.squeeze(), os.path.join(export_directory, "prices.pkl"))
+    return save_artifacts(dict(alphalens=factor.rename('factor'), prices=price_df.squeeze()), run_id, export_format)
 
 
 def export_quantstats(strat):
+    import quantstats as qs
     qs.extend_pandas()
 
     # ---- Format the values from results ----
-    df_values = pd.DataFrame(strat.analyzers.getbyname("quantstats").get_analysis()).T
-    df_values = df_values.iloc[:, 1]
+    df_values = strat.analyzers.getbyname("quantstats").get_analysis()['value']
     returns = qs.utils.to_returns(df_values)
-    returns.index = pd.to_datetime(returns.index)
     # ----------------------------------------
 
     # ---- Format the benchmark ----
-    benchmark = pd.read_csv('/Users/umoh/Data/Binance/1d/Binance_BTCUSDT_1d.csv',
-                            parse_dates=True, index_col=0)['close']
+    benchmark = load_benchmark()['close'].copy()
     benchmark.index = pd.to_datetime(benchmark.index) + pd.Timedelta(days=1) - pd.Timedelta(microseconds=11)
     benchmark = qs.utils.to_returns(benchmark)
 
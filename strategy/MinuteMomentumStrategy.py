@@ -3,12 +3,13 @@ import collections
 import backtrader as bt
 from backtrader.indicators import MovingAverageSimple
 
-from domain.indicator import Momentum
+from domain.indicator import RollingMomentum
+from domain.journal import JournalStrategy
 
 
-class MinuteMomentumStrategy(bt.Strategy):
+class MinuteMomentumStrategy(JournalStrategy):
     params = dict(
-        momentum=Momentum,
+        momentum=RollingMomentum,
         momentum_period=10,
         vol_period=20,
         minimum_momentum=40,
@@ -36,20 +37,3 @@ class MinuteMomentumStrategy(bt.Strategy):
     def calculate_target_weight(self):
         weight = 1 / (self.momentum * self.volatility)
         return weight / (weight + self.p.reserve)
-
-    def notify_order(self, order):
-        if order.alive():
-            return
-
-        otypetxt = 'Buy' if order.isbuy() else 'Sell'
-        if order.status == order.Completed:
-            self.log(
-                '{} Order Completed - Symbol: {} Size: {} @Price: {} Value: {:.2f} Comm: {:.2f}'.format(
-                    otypetxt, order.info['symbol'], order.executed.size, order.executed.price,
-                    order.executed.value, order.executed.comm
-                ))
-        else:
-            self.log('{} Order rejected'.format(otypetxt))
-
-    def log(self, arg):
-        print(f'{self.datetime.date(), arg}')
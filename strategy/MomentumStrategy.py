@@ -1,34 +1,40 @@
 import collections
-from datetime import datetime
 
 import backtrader as bt
 import numpy as np
 
-import pyarrow.parquet as pq
-import pyarrow as pa
+from domain.indicator import RollingMomentum
+from domain.indicator_cache import cached_atr, cached_momentum, cached_pct_change_stddev
+from domain.journal import JournalStrategy
+from domain.portfolio import rebalance_to_weights
 
-from domain.analysis import QuantStatsAnalyzer
-from domain.commission import CryptoSpotCommissionInfo
-from domain.data import load_data_into_cerebro
-from domain.indicator import Momentum
-from exports.exports import save_for_pyfolio, export_quantstats
 
-
-class MomentumStrategy(bt.Strategy):
+class MomentumStrategy(JournalStrategy):
     params = dict(
-        momentum=Momentum,
+        momentum=RollingMomentum,
         momentum_period=20,
         volatr=bt.ind.ATR,
         vol_period=20,
         minimum_momentum=40,
         reserve=0.05,
-        maximum_stake=0.2
+        maximum_stake=0.2,
+        cache=False  # serve the indicators from the indicator cache, with the default momentum and volatr only
     )
 
     def __init__(self):
+        if self.p.cache and (self.p.momentum is not RollingMomentum or self.p.volatr is not bt.ind.ATR):
+            raise ValueError('cache serves the RollingMomentum and ATR kernels, it ignores other momentum '
+                             'and volatr indicators')
+
         self.inds = collections.defaultdict(dict)
 
         for d in self.datas:
+            if self.p.cache:
+                self.inds[d]['strategy'] = cached_momentum(d, self.p.momentum_period)
+                self.inds[d]['volatility'] = cached_atr(d, self.p.vol_period)
+                self.inds[d]['stddev'] = cached_pct_change_stddev(d, self.p.vol_period, self.p.vol_period)
+                continue
+
             self.inds[d]['strategy'] = self.p.momentum(d, period=self.p.momentum_period)
             self.inds[d]['volatility'] = self.p.volatr(d, period=self.p.vol_period)
             pct_change = bt.ind.PctChange(d, period=self.p.vol_period)
@@ -46,23 +52,6 @@ class MomentumStrategy(bt.Strategy):
         elif kwargs['action'] == 'portfolio':
             self.rebalance_portfolio()
 
-    def notify_order(self, order):
-        if order.alive():
-            return
-
-        otypetxt = 'Buy' if order.isbuy() else 'Sell'
-        if order.status == order.Completed:
-            self.log(
-                '{} Order Completed - Symbol: {} Size: {} @Price: {} Value: {:.2f} Comm: {:.2f}'.format(
-                    otypetxt, order.info['symbol'], order.executed.size, order.executed.price,
-                    order.executed.value, order.executed.comm
-                ))
-        else:
-            self.log('{} Order rejected'.format(otypetxt))
-
-    def log(self, arg):
-        print(f'{self.datetime.date(), arg}')
-
     def rebalance_portfolio(self):
         # only look at data that we can have indicators for
         self.rankings = list(filter(lambda data: len(data) > self.p.vol_period, self.datas))
@@ -76,47 +65,26 @@ class MomentumStrategy(bt.Strategy):
                     self.close(d)
 
         # buy stocks with remaining cash
-        for i, d in enumerate(self.rankings[:num_stocks]):
-            cash = self.broker.get_cash()
-
-            target_weights = self.calculate_target_weights()
-
-            if cash <= 0:
-                break
-            if not self.getposition(self.data).size:
-                self.order_target_percent(d, target=target_weights[d], symbol=d._name)
+        if self.broker.get_cash() <= 0:
+            return
+        if not self.getposition(self.data).size:
+            rebalance_to_weights(self, self.rankings[:num_stocks], self.target_weight_vector())
 
     def rebalance_positions(self):
-        num_stocks = len(self.rankings)
-
         # rebalance all stocks
-        for i, d in enumerate(self.rankings[:num_stocks]):
-            cash = self.broker.get_cash()
-            target_weights = self.calculate_target_weights()
-
-            if cash <= 0:
-                break
-            self.order_target_percent(d, target=target_weights[d], symbol=d._name)
+        if self.broker.get_cash() <= 0:
+            return
+        rebalance_to_weights(self, self.rankings, self.target_weight_vector())
 
     def volatility(self, data):
         return data.pct_change().rolling(self.p.volatility_window).std().iloc[-1]
 
-    def calculate_target_weights(self):
-        num_stocks = len(self.rankings)
-
-        targets = {}
-        total_sum = self.p.reserve
-
-        for i, d in enumerate(self.rankings[:num_stocks]):
-            target_value = 1 / self.inds[d]["stddev"]
-            if np.isnan(target_value):
-                targets[d] = 0
-            else:
-                targets[d] = target_value
-                total_sum += target_value
+    def target_weight_vector(self):
+        # inverse volatility weights of the rankings, the reserve stays in cash
+        with np.errstate(divide='ignore'):
+            inverse = 1 / np.array([self.inds[d]["stddev"][0] for d in self.rankings])
+        inverse[np.isnan(inverse)] = 0
+        return inverse / (self.p.reserve + inverse.sum())
 
-        for k, v in targets.items():
-            percentage = targets[k] / total_sum
-            targets[k] = percentage
-
-        return targets
\ No newline at end of file
+    def calculate_target_weights(self):
+        return dict(zip(self.rankings, self.target_weight_vector()))
\ No newline at end of file
@@ -0,0 +1,58 @@
+import numpy as np
+
+from domain.data import align_datas
+from domain.indicator import pct_change, rolling_mean, rolling_momentum, rolling_std
+from domain.journal import JournalStrategy
+
+
+class MultiMinuteMomentumStrategy(JournalStrategy):
+    '''
+    MinuteMomentumStrategy over every data feed. The SMA, momentum and
+    volatility of all symbols are computed before the event loop as
+    (bars x symbols) matrices, ``next`` only reads the row of the current bar.
+    Requires preloaded data (the cerebro default).
+    '''
+    params = dict(
+        momentum_period=10,
+        vol_period=20,
+        minimum_momentum=40,
+        reserve=0.05,
+        maximum_stake=0.2,
+    )
+
+    def start(self):
+        super(MultiMinuteMomentumStrategy, self).start()
+        if not self.env._dopreload:
+            raise ValueError('MultiMinuteMomentumStrategy precomputes its indicators and needs preloaded data')
+
+        self.timeline, close = align_datas(self.datas)
+        sma = rolling_mean(close, self.p.vol_period)
+        self.momentum = rolling_momentum(sma, self.p.momentum_period)
+        self.volatility = rolling_std(pct_change(sma, self.p.vol_period), self.p.vol_period)
+        self.row = -1
+
+    def prenext(self):
+        # symbols list at different dates, do not wait for all of them
+        self.next()
+
+    def next(self):
+        dt = self.datetime[0]
+        while self.row + 1 < len(self.timeline) and self.timeline[self.row + 1] <= dt:
+            self.row += 1
+
+        if self.broker.get_cash() <= 0:
+            return
+
+        momentum = self.momentum[self.row]
+        selected = np.flatnonzero(momentum > self.p.minimum_momentum)
+        if not len(selected):
+            return
+
+        weights = self.calculate_target_weights(momentum[selected], self.volatility[self.row, selected])
+        for i, weight in zip(selected, weights):
+            d = self.datas[i]
+            self.order_target_percent(d, target=weight, symbol=d._name)
+
+    def calculate_target_weights(self, momentum, volatility):
+        weights = 1 / (momentum * volatility)
+        return weights / (weights.sum() + self.p.reserve)
@@ -1,13 +1,19 @@
 import backtrader as bt
+import numpy as np
 
+from domain.indicator_cache import cached_pct_change_stddev, cached_roc
+from domain.journal import JournalStrategy
+from domain.portfolio import rebalance_to_weights, top_k
 
-class RebalancingStrategy(bt.Strategy):
+
+class RebalancingStrategy(JournalStrategy):
     params = dict(
         selcperc=0.10,  # percentage of stocks to select from the universe
         rperiod=1,  # period for the returns calculation, default 1 period
         vperiod=36,  # lookback period for volatility - default 36 periods
         mperiod=12,  # lookback period for strategy - default 12 periods
-        reserve=0.05  # 5% reserve capital
+        reserve=0.05,  # 5% reserve capital
+        cache=False  # serve the indicators from the indicator cache
     )
 
     def __init__(self):
@@ -21,9 +27,13 @@ class RebalancingStrategy(bt.Strategy):
         self.perctarget = (1.0 - self.p.reserve) % self.selnum
 
         # returns, volatilities and strategy
-        rs = [bt.ind.PctChange(d, period=self.p.rperiod) for d in self.datas]
-        vs = [bt.ind.StdDev(ret, period=self.p.vperiod) for ret in rs]
-        ms = [bt.ind.ROC(d, period=self.p.mperiod) for d in self.datas]
+        if self.p.cache:
+            vs = [cached_pct_change_stddev(d, self.p.rperiod, self.p.vperiod) for d in self.datas]
+            ms = [cached_roc(d, self.p.mperiod) for d in self.datas]
+        else:
+            rs = [bt.ind.PctChange(d, period=self.p.rperiod) for d in self.datas]
+            vs = [bt.ind.StdDev(ret, period=self.p.vperiod) for ret in rs]
+            ms = [bt.ind.ROC(d, period=self.p.mperiod) for d in self.datas]
 
         # simple rank formula: (strategy * net payout) / volatility
         # the highest ranked: low vol, large strategy, large payout
@@ -34,53 +44,24 @@ class RebalancingStrategy(bt.Strategy):
     def next(self):
 
         self.started = True
-        # sort data and current rank
-        ranks = sorted(
-            self.ranks.items(),  # get the (d, rank), pair
-            key=lambda x: x[1][0],  # use rank (elem 1) and current time "0"
-            reverse=True  # highest ranked 1st ... please
-        )
-
-        # put top ranked in dict with data as key to test for presence
-        rtop = dict(ranks[:self.selnum])
-
-        # For logging purposes of stocks leaving the portfolio
-        rbot = dict(ranks[self.selnum:])
-
-        # prepare quick lookup list of stocks currently holding a position
-        posdata = [d for d, pos in self.getpositions().items() if pos]
-
-        # remove those no longer top ranked
-        # do this first to issue sell orders and free cash
-        for d in (d for d in posdata if d not in rtop):
-            # self.log('Exit {} - Rank {:.2f}'.format(d._name, rbot[d][0]))
-            self.order_target_percent(d, target=0.0)
-
-        # rebalance those already top ranked and still there
-        for d in (d for d in posdata if d in rtop):
-            # self.log('Rebal {} - Rank {:.2f}'.format(d._name, rtop[d][0]))
-            self.order_target_percent(d, target=self.perctarget)
-            del rtop[d]  # remove it, to simplify next iteration
-
-        # issue a target order for the newly top ranked stocks
-        # do this last, as this will generate buy orders consuming cash
-        for d in rtop:
-            # self.log('Enter {} - Rank {:.2f}'.format(d._name, rtop[d][0]))
-            self.order_target_percent(d, target=self.perctarget)
+        # current rank of every data, the top selnum of them are selected without sorting
+        scores = np.array([rank[0] for rank in self.ranks.values()])
+        top = top_k(scores, self.selnum)
+
+        # top ranked get the target allocation, positions no longer top ranked
+        # are closed. Sells are issued first to free cash for the buys. With
+        # more than one selected, perctarget over-allocates and the broker
+        # rejects the buys the cash cannot cover, which ones depends on this
+        # order, so results differ from issuing the orders in rank order
+        weights = np.zeros(len(scores))
+        weights[top] = self.perctarget
+        rebalance_to_weights(self, list(self.ranks), weights)
 
     def notify_order(self, order):
         if order.alive():
             return
 
-        otypetxt = 'Buy ' if order.isbuy() else 'Sell'
         if order.status == order.Completed:
-            self.log(
-                '{} Order Completed - Size: {} @Price: {} Value: {:.2f} Comm: {:.2f}'.format(
-                    otypetxt, order.executed.size, order.executed.price,
-                    order.executed.value, order.executed.comm
-                ))
+            self.journal_order(order)
         # else:
-        #     self.log('{} Order rejected'.format(otypetxt))
-
-    def log(self, arg):
-        print(f'{self.datetime.date(), arg}')
+        #     self.journal_order(order)
@@ -6,17 +6,19 @@ from os.path import isfile, join, dirname, basename
 import backtrader as bt
 import numpy as np
 import pandas as pd
-from scipy import stats
 
 from api.coinmarketcap import get_top_cryptos_by_market_volume
 from domain.analysis import QuantStatsAnalyzer, AlphalensAnalyzer
 from domain.commission import CryptoSpotCommissionInfo
 from domain.data import BinanceCsvDataFeed, load_data_into_cerebro
+from domain.indicator import window_momentum
+from domain.journal import JournalStrategy
+from domain.ranking import MomentumRanking
 from domain.sizer import BinanceSizer
 from exports.exports import save_for_alphalens, save_for_pyfolio, export_quantstats
 
 
-class BinanceStrategy(bt.Strategy):
+class BinanceStrategy(JournalStrategy):
     params = dict(stop_loss=0.02,
                   maximum_stake=0.2,
                   trail=False,
@@ -38,16 +40,20 @@ class BinanceStrategy(bt.Strategy):
 
         self.perctarget = (1.0 - self.p.reserve) % self.p.portfolio_size
 
+        self.ranking = MomentumRanking(self.datas, self.p.volatility_window + 1)
+
     def next(self):
 
         self.started = True
 
+        self.ranking.update()
+
         self.window = self.window + 1
 
         if self.window <= self.p.volatility_window:
             return
 
-        hist, ranking_table = self.calculate_ranking_table()
+        ranking_table = self.calculate_ranking_table()
 
         kept_positions = self.alter_kept_positions(ranking_table)
 
@@ -65,30 +71,23 @@ class BinanceStrategy(bt.Strategy):
                                                  ignore_index=True)
         new_portfolio.drop_duplicates(subset='symbol', keep='first')
 
-        vola_target_weights = self.calculate_target_weights(hist, new_portfolio)
+        vola_target_weights = self.calculate_target_weights(new_portfolio)
 
         self.buy_logic(kept_positions, new_portfolio, ranking_table, vola_target_weights)
 
     def is_trading_day(self):
         return self.datas[0].datetime.date(0).weekday() == 6
 
-    def volatility(self, data):
-        return data.pct_change().rolling(self.p.volatility_window).std().iloc[-1]
-
     def calculate_ranking_table(self):
-        df = pd.DataFrame()
-        for datum in self.datas:
-            hist = datum.close.lines[0].get(size=self.p.volatility_window + 1)
-            df[datum._name] = hist
-        ranking_table = rebalance(self, df)
-        return df, ranking_table
-
-    def calculate_target_weights(self, df, new_portfolio):
-        vola_table = df[new_portfolio['symbol']].apply(self.volatility)
-        inv_vola_table = 1 / vola_table
-        sum_inv_vola = np.sum(inv_vola_table)
-        vola_target_weights = inv_vola_table / sum_inv_vola
-        return vola_target_weights.apply(lambda x: min(x, self.p.maximum_stake))
+        # scored on the ring buffer view, only the ranking itself is labelled
+        scores = self.ranking.scores()
+        return pd.Series(scores, index=self.ranking.names).sort_values(ascending=False)
+
+    def calculate_target_weights(self, new_portfolio):
+        symbols = list(new_portfolio['symbol'])
+        inv_vola = 1 / self.ranking.volatility([self.ranking.columns[symbol] for symbol in symbols])
+        vola_target_weights = np.minimum(inv_vola / np.nansum(inv_vola), self.p.maximum_stake)
+        return pd.Series(vola_target_weights, index=symbols)
 
     def buy_logic(self, kept_positions, new_portfolio, ranking_table, vola_target_weights):
         for i, rank in new_portfolio.iterrows():
@@ -96,7 +95,7 @@ class BinanceStrategy(bt.Strategy):
             weight = vola_target_weights[symbol]
             if symbol in kept_positions or ranking_table[symbol] > self.p.minimum_momentum:
                 self.open_orders[symbol] = self.order_target_percent(
-                    data=[x for x in self.datas if symbol.split('-')[0] in x._dataname][0],
+                    data=self.getdatabyname(symbol),
                     target=weight, symbol=symbol)
 
     def get_new_portfolio(self, buy_list, ranking_table, kept_positions):
@@ -113,7 +112,7 @@ class BinanceStrategy(bt.Strategy):
         for symbol, security in self.open_orders.items():
             if symbol not in ranking_table or ranking_table[symbol] < self.p.minimum_momentum:
                 self.open_orders[symbol] = self.sell(
-                    data=[x for x in self.datas if symbol.split('-')[0] in x._dataname][0],
+                    data=self.getdatabyname(symbol),
                     symbol=symbol)
                 kept_positions.remove(symbol)
         return kept_positions
@@ -126,25 +125,15 @@ class BinanceStrategy(bt.Strategy):
         # Check if an order has been completed
         # Attention: broker could reject order if not enough cash
         if order.status in [order.Completed]:
-            if order.isbuy():
-                self.log('BUY EXECUTED, Symbol: %s, Price: %.5f, Cost: %.5f, Comm %.5f' %
-                         (order.info['symbol'], order.executed.price,
-                          order.executed.value,
-                          order.executed.comm))
+            self.journal_order(order)
 
+            if order.isbuy():
                 self.buyprice = order.executed.price
                 self.buycomm = order.executed.comm
                 # self.set_stop_loss(order)
 
-            else:  # Sell
-                self.log('SELL EXECUTED, Symbol: %s, Price: %.5f, Cost: %.5f, Comm %.5f' %
-                         (order.info['symbol'], order.executed.price,
-                          order.executed.value,
-                          order.executed.comm))
-
         elif order.status in [order.Canceled, order.Margin, order.Rejected]:
-            self.log('Order %s' % order.Status[order.status])
-        pass
+            self.journal_order(order)
 
     def set_stop_loss(self, order):
         if not self.p.trail:
@@ -158,25 +147,18 @@ class BinanceStrategy(bt.Strategy):
             return
 
         if trade.pnl < 0:
-            self.log('%s, OPERATION PROFIT, GROSS %.2f, NET %.2f' % (
-                trade.data._name, trade.pnl, trade.pnlcomm))
-
-    def log(self, txt, dt=None):
-        dt = dt or self.datas[0].datetime.date(0)
-        print('%s, %s' % (dt.isoformat(), txt))
+            self.journal_trade(trade)
 
 
 def rebalance(context, hist):
     # output_progress(context)
-    return hist.apply(momentum_score).sort_values(ascending=False)
+    # score every column at once instead of one linregress per symbol
+    scores = window_momentum(hist.to_numpy(dtype=np.float64).T)
+    return pd.Series(scores, index=hist.columns).sort_values(ascending=False)
 
 
 def momentum_score(data):
-    x = np.arange(len(data))
-    log_ts = np.log(data)
-    slope, intercept, r_value, p_value, std_err = stats.linregress(x, log_ts)
-    annualized_slope = (np.power(np.exp(slope), 365) - 1) * 100
-    return annualized_slope * (r_value ** 2)
+    return float(window_momentum(np.asarray(data, dtype=np.float64)))
 
 
 def output_progress(context):
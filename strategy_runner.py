@@ -1,27 +1,57 @@
 import argparse
-from datetime import datetime
-
-import backtrader as bt
-
-from domain.analysis import AlphalensAnalyzer, QuantStatsAnalyzer
-from domain.commission import CryptoSpotCommissionInfo
-from domain.data import load_data_into_cerebro
-from exports.exports import save_for_alphalens, save_for_pyfolio, export_quantstats
-from strategy.MinuteMomentumStrategy import MinuteMomentumStrategy
-from strategy.RebalancingStrategy import RebalancingStrategy
+from datetime import datetime, timedelta
 
 
 def run(args=None):
     args = parse_args(args)
 
-    cerebro = bt.Cerebro()
-
-    load_data_into_cerebro(cerebro, period='1m', start=datetime(2018, 1, 1), end=datetime(2020, 12, 31),
-                           filter_list=['ETHUSDT'])
+    # heavy modules load after the arguments are parsed, --help stays instant
+    import backtrader as bt
+
+    from domain.commission import CryptoSpotCommissionInfo
+    from domain.data import load_data_into_cerebro
+
+    # live and bounded runs only keep the lookback the indicators need
+    exactbars = 1 if args.paper or args.bounded else False
+    if args.align:
+        from domain.synchronizer import SynchronizedCerebro
+        cerebro = SynchronizedCerebro(exactbars=exactbars)
+    else:
+        cerebro = bt.Cerebro(exactbars=exactbars)
+
+    start = datetime.fromisoformat(args.fromdate)
+    end = datetime.fromisoformat(args.todate)
+    if args.resume:
+        from domain.checkpoint import load_checkpoint
+        # replay a warm-up period before the checkpoint so the indicators are primed again
+        start = bt.num2date(load_checkpoint(args.checkpoint)['datetime']) - timedelta(minutes=args.warmup)
+
+    if args.paper:
+        from domain.live import LatencyAnalyzer, WebsocketSource, add_live_datas
+        add_live_datas(cerebro, [WebsocketSource(symbol, url=args.stream_url) for symbol in args.symbols.split(',')])
+        cerebro.addanalyzer(LatencyAnalyzer, _name='latency')
+    elif args.compact or args.align:
+        import numpy as np
+        from domain.data import add_aligned_columns_to_cerebro, add_columns_to_cerebro, compact_columns, load_columns
+        columns = load_columns(period='1m', filter_list=args.symbols.split(',') if args.symbols else [],
+                               dtype=np.float32 if args.compact else np.float64)
+        if args.compact:
+            columns = compact_columns(columns)
+        if args.align:
+            add_aligned_columns_to_cerebro(cerebro, columns, start, end, args.fill)
+        else:
+            add_columns_to_cerebro(cerebro, columns, start, end)
+    else:
+        load_data_into_cerebro(cerebro, period='1m', start=start, end=end,
+                               filter_list=args.symbols.split(',') if args.symbols else [])
 
     # add strategy
     # cerebro.addstrategy(RebalancingStrategy, **eval('dict(' + args.strat + ')'))
-    cerebro.addstrategy(MinuteMomentumStrategy)
+    if args.multi:
+        from strategy.MultiMinuteMomentumStrategy import MultiMinuteMomentumStrategy as strategy
+    else:
+        from strategy.MinuteMomentumStrategy import MinuteMomentumStrategy as strategy
+    cerebro.addstrategy(strategy, **eval('dict(' + args.strat + ')'))
 
     # set the cash
     cerebro.broker.setcash(args.cash)
@@ -31,6 +61,13 @@ def run(args=None):
     # cerebro.addanalyzer(QuantStatsAnalyzer, _name="quantstats")
     # cerebro.addanalyzer(bt.analyzers.PyFolio, _name='pyfolio')
     # cerebro.addanalyzer(AlphalensAnalyzer, _name="alphalens")
+    if args.profile:
+        from domain.profiling import ProfilingAnalyzer
+        cerebro.addanalyzer(ProfilingAnalyzer, _name='profile')
+    if args.checkpoint:
+        from domain.checkpoint import CheckpointAnalyzer
+        cerebro.addanalyzer(CheckpointAnalyzer, _name='checkpoint', fname=args.checkpoint,
+                            every=args.checkpoint_every, resume=args.resume)
 
     results = cerebro.run()  # execute it all
 
@@ -42,6 +79,12 @@ def run(args=None):
     pnl = cerebro.broker.get_value() - args.cash
     print('Profit ... or Loss: {:.2f}'.format(pnl))
 
+    if args.profile:
+        print(results[0].analyzers.profile.report())
+
+    if args.paper:
+        print('Bar to order latency: {}'.format(results[0].analyzers.latency.get_analysis()))
+
     if args.plot:  # Plot if requested to
         cerebro.plot(**eval('dict(' + args.plot + ')'))
 
@@ -59,10 +102,10 @@ def parse_args(pargs=None):
                         metavar='kwargs', help='kwargs in k1=v1,k2=v2 format')
 
     # Defaults for dates
-    parser.add_argument('--fromdate', required=False, default='',
+    parser.add_argument('--fromdate', required=False, default='2018-01-01',
                         help='Date[time] in YYYY-MM-DD[THH:MM:SS] format')
 
-    parser.add_argument('--todate', required=False, default='',
+    parser.add_argument('--todate', required=False, default='2020-12-31',
                         help='Date[time] in YYYY-MM-DD[THH:MM:SS] format')
 
     parser.add_argument('--cerebro', required=False, default='',
@@ -74,6 +117,12 @@ def parse_args(pargs=None):
     parser.add_argument('--strat', required=False, default='',
                         metavar='kwargs', help='kwargs in k1=v1,k2=v2 format')
 
+    parser.add_argument('--symbols', default='ETHUSDT',
+                        help='Comma separated symbols, all of them when empty')
+
+    parser.add_argument('--multi', action='store_true', default=False,
+                        help='Trade every symbol with the multi-asset minute momentum strategy')
+
     parser.add_argument('--noprint', action='store_true', default=False,
                         help='Print the dataframe')
 
@@ -83,7 +132,43 @@ def parse_args(pargs=None):
     parser.add_argument('--plot', action='store_true', default=False,
                         help='Plot chart at the end')
 
-    return parser.parse_args(pargs)
+    parser.add_argument('--profile', action='store_true', default=False,
+                        help='Time the strategy, broker and analyzer hooks and print a report')
+
+    parser.add_argument('--checkpoint', default='',
+                        help='File the run state is checkpointed to, no checkpoints when empty')
+
+    parser.add_argument('--checkpoint-every', default=100000, type=int,
+                        help='Bars between two checkpoints')
+
+    parser.add_argument('--resume', action='store_true', default=False,
+                        help='Continue from the checkpoint file, --fromdate is ignored')
+
+    parser.add_argument('--warmup', default=1440, type=int,
+                        help='Minutes replayed before the checkpoint to prime the indicators on resume')
+
+    parser.add_argument('--compact', action='store_true', default=False,
+                        help='Keep the bars as float32 columns with int64 nanosecond datetimes')
+
+    parser.add_argument('--bounded', action='store_true', default=False,
+                        help='Only keep the lookback the indicators need instead of the whole history (exactbars)')
+
+    parser.add_argument('--align', action='store_true', default=False,
+                        help='Put every symbol on one merged timeline and advance all feeds together')
+
+    parser.add_argument('--fill', default='ffill', choices=['ffill', 'nan'],
+                        help='Bars of --align gaps: flat at the last close, or NaN')
+
+    parser.add_argument('--paper', action='store_true', default=False,
+                        help='Paper trade the live kline stream of --symbols with the simulated broker')
+
+    parser.add_argument('--stream-url', default='wss://stream.binance.com:9443',
+                        help='Kline websocket server, a local replay server for tests')
+
+    args = parser.parse_args(pargs)
+    if args.resume and not args.checkpoint:
+        parser.error('--resume needs --checkpoint')
+    return args
 
 
 if __name__ == '__main__':
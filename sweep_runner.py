@@ -0,0 +1,163 @@
+import argparse
+import itertools
+import multiprocessing
+import random
+from datetime import datetime
+
+# market data is loaded once in the parent and inherited by the forked workers
+market_data = {}
+
+
+def run(args=None):
+    args = parse_args(args)
+
+    # heavy modules load after the arguments are parsed, --help stays instant
+    import pandas as pd
+
+    from domain.data import load_columns
+    from domain.shared import SharedMarketData, attach, load_manifest
+    from strategy.MinuteMomentumStrategy import MinuteMomentumStrategy
+
+    if args.manifest:
+        # the universe is served by data_server.py, nothing is loaded here
+        manifest = load_manifest(args.manifest)
+        market_data.update(attach(manifest))
+    else:
+        market_data.update(load_columns(period=args.period,
+                                        filter_list=args.symbols.split(',') if args.symbols else []))
+
+    combinations = expand_grid(eval('dict(' + args.grid + ')'))
+    if args.samples and args.samples < len(combinations):
+        combinations = random.Random(args.seed).sample(combinations, args.samples)
+
+    start = datetime.fromisoformat(args.fromdate)
+    end = datetime.fromisoformat(args.todate)
+    tasks = [(MinuteMomentumStrategy, params, args.cash, start, end) for params in combinations]
+
+    if args.shared and not args.manifest:
+        with SharedMarketData(market_data) as plane:
+            results = run_tasks(tasks, args.workers, plane.manifest)
+    else:
+        results = run_tasks(tasks, args.workers, manifest if args.manifest else None)
+
+    table = pd.DataFrame(results).sort_values('final_value', ascending=False)
+    table.to_csv(args.out, index=False)
+    print(table.head(args.top).to_string(index=False))
+
+
+def expand_grid(grid):
+    keys = list(grid)
+    values = [v if isinstance(v, (list, tuple, range)) else [v] for v in grid.values()]
+    return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+
+
+def run_tasks(tasks, workers=None, manifest=None):
+    if manifest is None:
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            return list(pool.imap(run_task, tasks))
+
+    # fresh workers attach to the shared memory universe instead of inheriting a copy
+    with multiprocessing.get_context('spawn').Pool(workers, initializer=attach_market_data,
+                                                   initargs=(manifest,)) as pool:
+        return list(pool.imap(run_task, tasks))
+
+
+def attach_market_data(manifest):
+    from domain.shared import attach
+
+    market_data.clear()
+    market_data.update(attach(manifest))
+
+
+def run_task(task):
+    return run_backtest(*task)
+
+
+def run_backtest(strategy, params, cash, start, end, columns=None, tradefrom=None):
+    import backtrader as bt
+
+    from domain.checkpoint import WarmupAnalyzer
+    from domain.commission import CryptoSpotCommissionInfo
+    from domain.data import add_columns_to_cerebro
+
+    cerebro = bt.Cerebro(stdstats=False)
+    add_columns_to_cerebro(cerebro, market_data if columns is None else columns, start, end)
+    if tradefrom is not None:
+        # the bars from start to tradefrom only warm up the indicators
+        cerebro.addanalyzer(WarmupAnalyzer, tradefrom=tradefrom)
+
+    # order events of hundreds of runs are of no use, the journal is off unless asked for
+    cerebro.addstrategy(strategy, **dict(dict(journal_level='off'), **params))
+    cerebro.broker.setcash(cash)
+    cerebro.broker.addcommissioninfo(CryptoSpotCommissionInfo())
+
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe', timeframe=bt.TimeFrame.Days)
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trades')
+
+    strat = cerebro.run()[0]
+
+    value = cerebro.broker.get_value()
+    return dict(params, final_value=value, pnl=value - cash, **summarize(strat))
+
+
+def summarize(strat):
+    trades = strat.analyzers.trades.get_analysis()
+    return dict(
+        sharpe=strat.analyzers.sharpe.get_analysis()['sharperatio'],
+        max_drawdown=strat.analyzers.drawdown.get_analysis().max.drawdown,
+        trades=trades.get('total', {}).get('closed', 0),
+        won=trades.get('won', {}).get('total', 0),
+    )
+
+
+def parse_args(pargs=None):
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Parameter sweep of the minute momentum strategy',
+    )
+
+    parser.add_argument('--grid', required=True,
+                        metavar='kwargs', help='k1=[v1,v2],k2=range(a,b,c) format, one run per combination')
+
+    parser.add_argument('--samples', default=0, type=int,
+                        help='Run a random sample of this many combinations instead of the full grid')
+
+    parser.add_argument('--seed', default=0, type=int,
+                        help='Seed for the random sample')
+
+    parser.add_argument('--workers', default=None, type=int,
+                        help='Number of worker processes, all cores by default')
+
+    parser.add_argument('--period', default='1m',
+                        help='Bar period of the data to load')
+
+    parser.add_argument('--symbols', default='ETHUSDT',
+                        help='Comma separated symbols, all of them when empty')
+
+    parser.add_argument('--fromdate', default='2018-01-01',
+                        help='Date[time] in YYYY-MM-DD[THH:MM:SS] format')
+
+    parser.add_argument('--todate', default='2020-12-31',
+                        help='Date[time] in YYYY-MM-DD[THH:MM:SS] format')
+
+    parser.add_argument('--shared', action='store_true', default=False,
+                        help='Publish the data into shared memory and run spawned workers attached to it')
+
+    parser.add_argument('--manifest', default='',
+                        help='Manifest of a running data_server.py, the data is attached instead of loaded')
+
+    parser.add_argument('--cash', default=10.0, type=float,
+                        help='Starting cash of every run')
+
+    parser.add_argument('--out', default='sweep.csv',
+                        help='File the result table is written to')
+
+    parser.add_argument('--top', default=10, type=int,
+                        help='Number of best runs to print')
+
+    return parser.parse_args(pargs)
+
+
+if __name__ == '__main__':
+    run()
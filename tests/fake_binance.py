@@ -0,0 +1,35 @@
+import pandas as pd
+
+interval_ms = {'1m': 60000, '5m': 300000, '1h': 3600000, '1d': 86400000}
+
+
+def make_klines(first, count, interval='1m', price=100.0):
+    """Closed klines in the layout of the Binance API, one every ``interval`` from ``first``"""
+    start = pd.Timestamp(first).value // 10 ** 6
+    step = interval_ms[interval]
+    klines = []
+    for i in range(count):
+        t = start + i * step
+        p = price + i
+        klines.append([t, repr(p), repr(p + 1), repr(p - 1), repr(p + 0.5), '10.0', t + step - 1,
+                       '1000.0', 5, '4.0', '400.0', '0'])
+    return klines
+
+
+class FakeBinanceClient:
+    '''
+    Stands in for ``binance.client.Client`` in the sync. Serves the klines of
+    ``klines`` per symbol from the requested start, raising ``errors`` one per
+    call first, and records every request.
+    '''
+
+    def __init__(self, klines=None, errors=()):
+        self.klines = klines or {}
+        self.errors = list(errors)
+        self.requests = []
+
+    def get_historical_klines(self, symbol, interval, start_str, end_str=None, limit=1000):
+        self.requests.append((symbol, interval, start_str))
+        if self.errors:
+            raise self.errors.pop(0)
+        return [k for k in self.klines.get(symbol, []) if k[0] >= start_str]
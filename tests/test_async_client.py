@@ -0,0 +1,128 @@
+import asyncio
+import os
+
+import aiohttp
+import pandas as pd
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from api.async_client import AsyncBinanceClient, ResponseCache
+from api.kline_sync import load_manifest, sync_async
+from fake_binance import make_klines
+
+
+def mock_binance(klines, statuses=()):
+    '''
+    Local stand-in for the Binance REST API serving ``klines`` per symbol.
+    ``statuses`` are answered one per request before any data is served.
+    '''
+    statuses = list(statuses)
+    requests = []
+
+    async def klines_handler(request):
+        requests.append(dict(request.query))
+        if statuses:
+            status = statuses.pop(0)
+            return web.json_response({'code': -1, 'msg': 'mock'}, status=status, headers={'Retry-After': '0'})
+
+        start, end = int(request.query['startTime']), int(request.query['endTime'])
+        rows = [k for k in klines.get(request.query['symbol'], []) if start <= k[0] <= end]
+        return web.json_response(rows[:int(request.query['limit'])])
+
+    async def exchange_info(request):
+        requests.append(dict(request.query))
+        return web.json_response({'symbols': [{'symbol': symbol, 'quoteAsset': 'USDT'} for symbol in klines]})
+
+    app = web.Application()
+    app.router.add_get('/api/v3/klines', klines_handler)
+    app.router.add_get('/api/v3/exchangeInfo', exchange_info)
+    return app, requests
+
+
+async def serve(app, test, **kwargs):
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        async with AsyncBinanceClient(str(server.make_url('')).rstrip('/'), backoff=0, **kwargs) as client:
+            return await test(client)
+    finally:
+        await server.close()
+
+
+def end_of(klines):
+    return klines[-1][6] + 1
+
+
+def test_klines_are_paged_and_joined():
+    klines = make_klines('2020-01-01', 2500)
+    app, requests = mock_binance({'BTCUSDT': klines})
+
+    result = asyncio.run(serve(app, lambda client: client.klines('BTCUSDT', '1m', klines[0][0], end_of(klines))))
+
+    assert result == klines
+    assert len(requests) == 3
+
+
+@pytest.mark.parametrize('status', [429, 418, 500, 503])
+def test_rate_limits_and_server_errors_are_retried(status):
+    klines = make_klines('2020-01-01', 10)
+    app, requests = mock_binance({'BTCUSDT': klines}, statuses=[status, status])
+
+    result = asyncio.run(serve(app, lambda client: client.klines('BTCUSDT', '1m', klines[0][0], end_of(klines))))
+
+    assert result == klines
+    assert len(requests) == 3
+
+
+def test_client_errors_are_raised_at_once():
+    klines = make_klines('2020-01-01', 10)
+    app, requests = mock_binance({'BTCUSDT': klines}, statuses=[400])
+
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        asyncio.run(serve(app, lambda client: client.klines('BTCUSDT', '1m', klines[0][0], end_of(klines))))
+    assert error.value.status == 400
+    assert len(requests) == 1
+
+
+def test_server_errors_are_raised_after_the_last_attempt():
+    klines = make_klines('2020-01-01', 10)
+    app, requests = mock_binance({'BTCUSDT': klines}, statuses=[502] * 10)
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        asyncio.run(serve(app, lambda client: client.klines('BTCUSDT', '1m', klines[0][0], end_of(klines)),
+                          retries=3))
+    assert len(requests) == 3
+
+
+def test_cached_responses_are_not_requested_again(tmp_path):
+    app, requests = mock_binance({'BTCUSDT': [], 'ETHUSDT': []})
+
+    async def test(client):
+        return await client.usdt_symbols(), await client.usdt_symbols()
+
+    first, second = asyncio.run(serve(app, test, cache=ResponseCache(str(tmp_path))))
+    assert first == second == ['BTCUSDT', 'ETHUSDT']
+    assert len(requests) == 1
+
+
+def test_sync_async_resumes_without_duplicates(tmp_path, monkeypatch):
+    # a first sync pages from the start of the history, keep it short
+    monkeypatch.setattr('api.kline_sync.start', '31 Jan 2020')
+    klines = {'BTCUSDT': make_klines('2020-01-31 22:00', 200), 'ETHUSDT': make_klines('2020-01-31 23:00', 150)}
+    first = {symbol: rows[:100] for symbol, rows in klines.items()}
+    end_ms = max(end_of(rows) for rows in klines.values())
+
+    app, _ = mock_binance(first)
+    asyncio.run(serve(app, lambda client: sync_async(client, list(klines), root=str(tmp_path), end_ms=end_ms)))
+    app, _ = mock_binance(klines)
+    asyncio.run(serve(app, lambda client: sync_async(client, list(klines), root=str(tmp_path), end_ms=end_ms)))
+
+    manifest = load_manifest(str(tmp_path))
+    for symbol, rows in klines.items():
+        assert manifest['1m'][symbol] == rows[-1][0]
+        directory = os.path.join(str(tmp_path), '1m', symbol)
+        assert sorted(os.listdir(directory)) == ['2020-01.parquet', '2020-02.parquet']
+        df = pd.concat([pd.read_parquet(os.path.join(directory, fname)) for fname in sorted(os.listdir(directory))])
+        assert len(df) == len(rows)
+        assert not df.index.duplicated().any()
@@ -0,0 +1,70 @@
+import os
+
+import pandas as pd
+import pytest
+from binance.exceptions import BinanceRequestException
+
+from api.kline_sync import fetch_klines, load_manifest, partition_path, sync
+from fake_binance import FakeBinanceClient, make_klines
+
+
+def read_partitions(root, symbol):
+    directory = os.path.join(root, '1m', symbol)
+    return pd.concat([pd.read_parquet(os.path.join(directory, fname)) for fname in sorted(os.listdir(directory))])
+
+
+def test_sync_writes_monthly_partitions(tmp_path):
+    klines = make_klines('2020-01-31 23:50', 20)
+    client = FakeBinanceClient({'BTCUSDT': klines})
+
+    manifest = sync(client, ['BTCUSDT'], root=str(tmp_path), workers=1)
+
+    assert os.path.isfile(partition_path(str(tmp_path), '1m', 'BTCUSDT', '2020-01'))
+    assert os.path.isfile(partition_path(str(tmp_path), '1m', 'BTCUSDT', '2020-02'))
+    assert manifest['1m']['BTCUSDT'] == klines[-1][0]
+    assert len(read_partitions(str(tmp_path), 'BTCUSDT')) == 20
+
+
+def test_sync_resumes_from_manifest_without_duplicates(tmp_path):
+    klines = make_klines('2020-01-31 23:00', 120)
+    client = FakeBinanceClient({'BTCUSDT': klines[:70]})
+    sync(client, ['BTCUSDT'], root=str(tmp_path), workers=1)
+
+    client = FakeBinanceClient({'BTCUSDT': klines})
+    sync(client, ['BTCUSDT'], root=str(tmp_path), workers=1)
+
+    # the second sync only asks for the bars after the last one synced
+    assert client.requests == [('BTCUSDT', '1m', klines[69][0] + 1)]
+    assert load_manifest(str(tmp_path))['1m']['BTCUSDT'] == klines[-1][0]
+
+    df = read_partitions(str(tmp_path), 'BTCUSDT')
+    assert len(df) == 120
+    assert not df.index.duplicated().any()
+    assert df.index.is_monotonic_increasing
+
+
+def test_overlapping_bars_are_not_duplicated(tmp_path):
+    klines = make_klines('2020-03-01', 50)
+    sync(FakeBinanceClient({'ETHUSDT': klines[:30]}), ['ETHUSDT'], root=str(tmp_path), workers=1)
+
+    # a client that ignores the start and serves everything again
+    client = FakeBinanceClient({'ETHUSDT': klines})
+    client.get_historical_klines = lambda symbol, interval, start_str: klines
+    sync(client, ['ETHUSDT'], root=str(tmp_path), workers=1)
+
+    df = read_partitions(str(tmp_path), 'ETHUSDT')
+    assert len(df) == 50
+    assert not df.index.duplicated().any()
+
+
+def test_fetch_retries_client_errors_only():
+    klines = make_klines('2020-01-01', 3)
+    client = FakeBinanceClient({'BTCUSDT': klines}, errors=[BinanceRequestException('bad gateway'),
+                                                            ConnectionError('reset')])
+    assert fetch_klines(client, 'BTCUSDT', '1m', 0, backoff=0) == klines
+    assert len(client.requests) == 3
+
+    client = FakeBinanceClient({'BTCUSDT': klines}, errors=[TypeError('bug')])
+    with pytest.raises(TypeError):
+        fetch_klines(client, 'BTCUSDT', '1m', 0, backoff=0)
+    assert len(client.requests) == 1
@@ -0,0 +1,127 @@
+import argparse
+import math
+from datetime import datetime
+
+import pandas as pd
+
+from domain.data import load_columns
+from strategy.MinuteMomentumStrategy import MinuteMomentumStrategy
+from sweep_runner import expand_grid, market_data, run_tasks
+
+
+def run(args=None):
+    args = parse_args(args)
+
+    # loaded once, every fold runs on ArrayDataFeed windows over these same arrays
+    market_data.update(load_columns(period=args.period, filter_list=args.symbols.split(',') if args.symbols else []))
+
+    combinations = expand_grid(eval('dict(' + args.grid + ')'))
+    folds = make_folds(datetime.fromisoformat(args.fromdate), datetime.fromisoformat(args.todate),
+                       pd.Timedelta(args.train), pd.Timedelta(args.test), pd.Timedelta(args.step or args.test),
+                       bar_length(args.period))
+    warmup = pd.Timedelta(args.warmup)
+
+    # optimize every fold in parallel, then evaluate each fold's best params on its test window
+    train_tasks = [(MinuteMomentumStrategy, params, args.cash, fold[0], fold[1])
+                   for fold in folds for params in combinations]
+    train_results = run_tasks(train_tasks, args.workers)
+
+    best = []
+    for i in range(len(folds)):
+        fold_results = train_results[i * len(combinations):(i + 1) * len(combinations)]
+        best.append(max(fold_results, key=lambda result: score(result, args.metric)))
+
+    # test runs start warm, the bars before the test window prime the indicators without trading
+    test_tasks = [(MinuteMomentumStrategy, {k: result[k] for k in combinations[0]}, args.cash,
+                   fold[2] - warmup, fold[3], None, fold[2])
+                  for fold, result in zip(folds, best)]
+    test_results = run_tasks(test_tasks, args.workers)
+
+    rows = []
+    for i, (fold, train, test) in enumerate(zip(folds, best, test_results)):
+        row = dict(fold=i, train_start=fold[0], train_end=fold[1], test_start=fold[2], test_end=fold[3])
+        row.update(test)
+        row['train_' + args.metric] = train[args.metric]
+        rows.append(row)
+
+    table = pd.DataFrame(rows)
+    table.to_csv(args.out, index=False)
+    print(table.to_string(index=False))
+
+
+def bar_length(period):
+    return pd.Timedelta(period[:-1] + {'m': 'min', 'h': 'h', 'd': 'D'}[period[-1]])
+
+
+def make_folds(start, end, train, test, step, bar=pd.Timedelta(minutes=1)):
+    """
+    (train start, train end, test start, test end) per fold. The feeds include
+    both ends of a window, so every window stops one ``bar`` before the next
+    one starts and no bar is in both.
+    """
+    folds = []
+    train_start = start
+    while train_start + train + test <= end + pd.Timedelta(days=1):
+        train_end = train_start + train
+        folds.append((train_start, train_end - bar, train_end, train_end + test - bar))
+        train_start += step
+    return folds
+
+
+def score(result, metric):
+    value = result[metric]
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return -math.inf
+    return value
+
+
+def parse_args(pargs=None):
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Walk-forward optimization of the minute momentum strategy',
+    )
+
+    parser.add_argument('--grid', required=True,
+                        metavar='kwargs', help='k1=[v1,v2],k2=range(a,b,c) format, searched on every train window')
+
+    parser.add_argument('--train', default='180D',
+                        help='Length of each train window')
+
+    parser.add_argument('--test', default='30D',
+                        help='Length of each test window')
+
+    parser.add_argument('--step', default='',
+                        help='Distance between consecutive folds, the test length when empty')
+
+    parser.add_argument('--warmup', default='1D',
+                        help='Span of bars before each test window that primes the indicators without trading')
+
+    parser.add_argument('--metric', default='final_value',
+                        help='Result column maximized on the train windows')
+
+    parser.add_argument('--workers', default=None, type=int,
+                        help='Number of worker processes, all cores by default')
+
+    parser.add_argument('--period', default='1m',
+                        help='Bar period of the data to load')
+
+    parser.add_argument('--symbols', default='ETHUSDT',
+                        help='Comma separated symbols, all of them when empty')
+
+    parser.add_argument('--fromdate', default='2018-01-01',
+                        help='Date[time] in YYYY-MM-DD[THH:MM:SS] format')
+
+    parser.add_argument('--todate', default='2020-12-31',
+                        help='Date[time] in YYYY-MM-DD[THH:MM:SS] format')
+
+    parser.add_argument('--cash', default=10.0, type=float,
+                        help='Starting cash of every run')
+
+    parser.add_argument('--out', default='walkforward.csv',
+                        help='File the fold table is written to')
+
+    return parser.parse_args(pargs)
+
+
+if __name__ == '__main__':
+    run()